@@ -0,0 +1,34 @@
+"""
+Shared E2B Sandbox for the test_e2b*.py scripts.
+Creating a Sandbox is the slow part of each test, so scripts run in one process
+(e.g. by a test runner) reuse a single one. Set LAZARUS_FRESH_SANDBOX=1 to give
+every caller its own.
+"""
+
+import os
+import atexit
+import threading
+
+_SB = None
+_LOCK = threading.Lock()
+
+def _kill(sb):
+    try:
+        sb.kill()
+    except Exception as e:
+        print(f"[*] Sandbox cleanup warning: {str(e)[:100]}")
+
+def get_sandbox():
+    """Returns the shared Sandbox, creating it on first use. Killed at interpreter exit."""
+    global _SB
+    # Imported here so importing this module doesn't pay for the SDK import
+    from e2b_code_interpreter import Sandbox
+    if os.getenv("LAZARUS_FRESH_SANDBOX") == "1":
+        sb = Sandbox.create()
+        atexit.register(_kill, sb)
+        return sb
+    with _LOCK:
+        if _SB is None:
+            _SB = Sandbox.create()
+            atexit.register(_kill, _SB)
+        return _SB
@@ -1,15 +1,31 @@
 import os
+import atexit
+import io
 import json
+import multiprocessing
+import gzip
+import hashlib
+import random
 import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import ast
+import shlex
+import sqlite3
+import tarfile
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from simple_env import load_env
-from prompts import get_code_generation_prompt
+from prompts import get_code_generation_prompt, get_original_files_context
 from resurrection_memory import (
-    load_memory, record_attempt_start, record_failure, 
+    load_memory, record_attempt_start, record_tech_stack, record_failure, 
     record_success, record_dependency_issue, record_decision,
-    get_memory_context_for_prompt, get_memory_summary
+    get_memory_context_for_prompt, get_memory_summary, memory_session
 )
 
 # Try to import E2B, handle failure
@@ -20,11 +36,48 @@ except ImportError:
     E2B_AVAILABLE = False
     print("[!] E2B Code Interpreter not found. Sandbox execution will be skipped.")
 
+# orjson parses large GitHub/Gemini payloads ~3x faster; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load Environment
 load_env()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 E2B_API_KEY = os.getenv("E2B_API_KEY")
-
+# Optional E2B template with pre-downloaded wheels in WHEELHOUSE_DIR
+E2B_TEMPLATE = os.getenv("E2B_TEMPLATE")
+
+# Characters that break mkdir and other shell commands
+SANITIZE_TABLE = str.maketrans({
+    '(': '',  # Remove parentheses - causes subshell
+    ')': '',
+    '[': '',  # Remove brackets - causes glob
+    ']': '',
+    '{': '',  # Remove braces - causes expansion
+    '}': '',
+    '@': '',  # Remove @ - causes issues
+    '#': '',  # Remove # - causes comments
+    '$': '',  # Remove $ - causes variable expansion
+    '&': '',  # Remove & - causes background
+    '*': '',  # Remove * - causes glob
+    '?': '',  # Remove ? - causes glob
+    '!': '',  # Remove ! - causes history expansion
+    '|': '',  # Remove | - causes pipe
+    ';': '',  # Remove ; - causes command separator
+    '<': '',  # Remove < - causes redirect
+    '>': '',  # Remove > - causes redirect
+    '`': '',  # Remove ` - causes command substitution
+    "'": '',  # Remove ' - causes quoting issues
+    '"': '',  # Remove " - causes quoting issues
+    ' ': '_',  # Replace spaces with underscores
+})
+DUP_UNDERSCORE_RE = re.compile(r'_{2,}')
+DUP_SLASH_RE = re.compile(r'/{2,}')
+
+# Retries and sandbox reuse upload the same generated paths again
+@lru_cache(maxsize=4096)
 def sanitize_path(path: str) -> str:
     """
     Sanitizes file paths to be safe for bash shell commands.
@@ -33,44 +86,486 @@ def sanitize_path(path: str) -> str:
     if not path:
         return path
     
-    # Replace problematic characters
-    replacements = {
-        '(': '',  # Remove parentheses - causes subshell
-        ')': '',
-        '[': '',  # Remove brackets - causes glob
-        ']': '',
-        '{': '',  # Remove braces - causes expansion
-        '}': '',
-        '@': '',  # Remove @ - causes issues
-        '#': '',  # Remove # - causes comments
-        '$': '',  # Remove $ - causes variable expansion
-        '&': '',  # Remove & - causes background
-        '*': '',  # Remove * - causes glob
-        '?': '',  # Remove ? - causes glob
-        '!': '',  # Remove ! - causes history expansion
-        '|': '',  # Remove | - causes pipe
-        ';': '',  # Remove ; - causes command separator
-        '<': '',  # Remove < - causes redirect
-        '>': '',  # Remove > - causes redirect
-        '`': '',  # Remove ` - causes command substitution
-        "'": '',  # Remove ' - causes quoting issues
-        '"': '',  # Remove " - causes quoting issues
-        ' ': '_',  # Replace spaces with underscores
-    }
+    # One translate pass, then collapse double underscores / slashes
+    result = path.translate(SANITIZE_TABLE)
+    result = DUP_UNDERSCORE_RE.sub('_', result)
+    return DUP_SLASH_RE.sub('/', result)
+
+# The "Rosetta Stone" of Imports
+PACKAGE_MAP = {
+    # Data & AI
+    "numpy": "numpy",
+    "pandas": "pandas",
+    "cv2": "opencv-python-headless", # Headless for servers!
+    "PIL": "pillow",
+    "sklearn": "scikit-learn",
+    "openai": "openai",
+    "google.generativeai": "google-generative-ai",
+    
+    # Backend Frameworks
+    "fastapi": "fastapi",
+    "uvicorn": "uvicorn",
+    "flask": "flask",
+    "flask_cors": "flask-cors",
+    "sqlalchemy": "sqlalchemy",
+    
+    # Auth & Security
+    "jose": "python-jose[cryptography]",
+    "jwt": "python-jose[cryptography]",
+    "passlib": "passlib[bcrypt]",
+    "bcrypt": "bcrypt==4.0.1", # CRITICAL: Force 4.0.1
+    "multipart": "python-multipart", # Required for Form data
+    
+    # Utilities
+    "dotenv": "python-dotenv",
+    "requests": "requests",
+    "pydantic": "pydantic",
+    "email_validator": "email-validator",
+    "bs4": "beautifulsoup4"
+}
+
+# owner/repo from a GitHub URL
+GITHUB_URL_RE = re.compile(r"github\.com/([^/]+)/([^/.]+)")
+
+# Deep-scan file selection
+SKIP_DIRS = frozenset({'node_modules', 'venv', '.venv', '__pycache__', '.git', 'dist', 'build'})
+CODE_EXTENSIONS = frozenset({
+    '.py', '.js', '.ts', '.tsx', '.jsx', '.json', '.yaml', '.yml',
+    '.html', '.css', '.scss', '.md', '.txt', '.env', '.env.example',
+    '.toml', '.cfg', '.ini', '.sql', '.prisma', '.graphql'
+})
+IMPORTANT_FILES = frozenset({
+    'package.json', 'requirements.txt', 'Pipfile', 'pyproject.toml',
+    'docker-compose.yml', 'docker-compose.yaml', 'Dockerfile',
+    '.env', '.env.example', '.env.local', 'config.py', 'settings.py',
+    'schema.prisma', 'models.py', 'schemas.py', 'database.py'
+})
+
+# Generated lockfiles: large, machine-written and regenerated by npm/pnpm in the sandbox,
+# so they are left out of the deep scan (and the prompt) entirely
+LOCKFILES = frozenset({'package-lock.json', 'pnpm-lock.yaml', 'npm-shrinkwrap.json'})
+
+# Frontend detection (_detect_frontend): exact config filenames, config-file stems
+# matched anywhere in the lowercased basename, and package.json dirs that look like a client
+FRAMEWORK_MARKERS = {
+    'angular.json': "Angular",
+    'vue.config.js': "Vue CLI",
+    'gatsby-config.js': "Gatsby",
+    'svelte.config.js': "SvelteKit",
+}
+FRAMEWORK_CONFIG_RE = re.compile(r'(next|vite|nuxt)\.config')
+FRAMEWORK_CONFIG_TYPES = {'next': "Next.js", 'vite': "Vite", 'nuxt': "Nuxt.js"}
+FRONTEND_DIR_RE = re.compile(r'frontend|client|web')
+# Static HTML and server-side templates (EJS, Pug/Jade, Handlebars, Jinja2, PHP, ERB)
+SERVED_PAGE_EXTS = ('.html', '.ejs', '.pug', '.jade', '.hbs', '.handlebars', '.jinja2', '.j2', '.php', '.erb')
+
+# Larger files (minified bundles, lockfiles) are skipped unless in IMPORTANT_FILES
+MAX_SCAN_FILE_BYTES = 256 * 1024
+# A NUL within this many leading bytes marks a file as binary
+BINARY_SNIFF_BYTES = 512
+
+# Deep-scan language labels by extension (no leading dot)
+LANGUAGE_BY_EXT = {
+    'py': 'python', 'js': 'javascript', 'ts': 'typescript',
+    'tsx': 'typescript-react', 'jsx': 'javascript-react',
+    'json': 'json', 'yaml': 'yaml', 'yml': 'yaml',
+    'html': 'html', 'css': 'css', 'sql': 'sql'
+}
+
+# Tech-stack scan patterns
+ENDPOINT_RE = re.compile(r'@app\.(get|post|put|delete|patch)\([\'"]([^\'"]+)[\'"]')
+ENV_ASSIGN_RE = re.compile(r'([A-Z_][A-Z0-9_]+)\s*=')
+# Every keyword _analyze_file_for_tech_stack cares about, matched in one pass.
+# The lookahead makes matches zero-width so overlapping keywords ("pymysql"/"mysql") are all seen;
+# IGNORECASE avoids allocating a lowercased copy of every file.
+TECH_KEYWORDS = (
+    'fastapi', 'flask', 'express', 'django',
+    'mongodb', 'mongoose', 'pymongo', 'postgresql', 'psycopg', 'pg.', 'mysql', 'pymysql', 'sqlite', 'prisma',
+    'react', 'vue', 'angular', 'next',
+)
+TECH_KEYWORD_RE = re.compile("(?=(" + "|".join(re.escape(k) for k in TECH_KEYWORDS) + "))", re.IGNORECASE | re.ASCII)
+
+# Items per deep-scan list (must preserve, can modernize, endpoints) shown in the planning prompt
+PLAN_LIST_LIMIT = 20
+
+# Pull request body for commit_all_files_to_github (lists at most PR_BODY_MAX_FILES files)
+PR_BODY_MAX_FILES = 20
+PR_BODY_TEMPLATE = """## 🦾 Automated Resurrection by Lazarus Engine
+
+This PR contains the **completely modernized** version of your legacy codebase.
+
+### 📁 Files Changed ({n} files)
+{file_list_md}
+{truncated}
+
+### ✨ What's Included
+- ✅ Modern FastAPI backend with CORS and validation
+- ✅ Next.js 15 frontend with Tailwind CSS
+- ✅ Production-ready code with error handling
+- ✅ Docker Compose for deployment  
+- ✅ TypeScript types and Pydantic models
+
+---
+*Generated by [Lazarus Engine](https://github.com/ArunN2005/lazarus-hackathon) 🧬*"""
+
+# Generated-code extraction (clean_code / generate_code)
+CODE_BLOCK_RE = re.compile(r"```(?:javascript|python|bash)?\n(.*?)```", re.DOTALL)
+FILE_OPEN_RE = re.compile(r'<file path="([^"]*)">')
+FILE_CLOSE_TAG = "</file>"
+
+# Live preview URL reported by execute_in_sandbox
+PREVIEW_URL_RE = re.compile(r"\[PREVIEW_URL\] (https://\S+)")
+# Characters from the end of the sandbox output searched before falling back to all of it
+PREVIEW_TAIL_CHARS = 4096
+
+# Sandbox lifetime (30m) so the user can explore the preview
+SANDBOX_TIMEOUT = 1800
+
+# Where the generated-file bundle is staged inside the sandbox
+SANDBOX_BUNDLE_PATH = "/tmp/lazarus_bundle.tgz"
+# gzip level for the bundle: 6 is several times faster than tarfile's default 9 at ~1% larger output on source text
+BUNDLE_COMPRESSLEVEL = 6
+
+# Ports a generated Node.js server usually listens on, in priority order
+NODE_PROBE_PORTS = (3000, 3001, 8000, 8080, 5000, 4000, 5001)
+# One sandbox command that prints the first port accepting TCP connections (or nothing),
+# using bash's /dev/tcp like TCP_PROBE_CMD so no interpreter starts per probe
+NODE_PORT_PROBE_CMD = (
+    f"for p in {' '.join(map(str, NODE_PROBE_PORTS))}; do "
+    "timeout 0.3 bash -c \"exec 3<>/dev/tcp/127.0.0.1/$p\" 2>/dev/null && { echo $p; break; }; "
+    "done; true"
+)
+
+# Merged requirements file for the single pip install pass
+SANDBOX_REQUIREMENTS_PATH = "/tmp/merged_reqs.txt"
+
+# Local wheels (baked into a custom template) are preferred, PyPI covers misses
+WHEELHOUSE_DIR = "/opt/wheels"
+WHEELHOUSE_ARGS = f"$([ -d {WHEELHOUSE_DIR} ] && echo --find-links {WHEELHOUSE_DIR})"
+
+# Pinned last in every install so it wins over requirements.txt
+BCRYPT_PIN = "bcrypt==4.0.1"
+
+# Readiness probe, written into the sandbox once per deploy.
+# Note: urlopen throws HTTPError for 4xx/5xx, so we catch it
+PROBE_SCRIPT_PATH = "/tmp/lazarus_probe.py"
+PROBE_SCRIPT = """
+import sys
+import urllib.request
+import urllib.error
+try:
+    response = urllib.request.urlopen(f'http://127.0.0.1:{sys.argv[1]}', timeout=2)
+    print(response.status)
+except urllib.error.HTTPError as e:
+    print(e.code)
+except Exception as e:
+    print('error')
+"""
+# NODE_PORT_PROBE_CMD for Sandboxes without /dev/tcp: any HTTP status means the port is served
+NODE_PORT_PROBE_SCRIPT_CMD = (
+    f"for p in {' '.join(map(str, NODE_PROBE_PORTS))}; do "
+    f"[ \"$(python {PROBE_SCRIPT_PATH} $p)\" != error ] && {{ echo $p; break; }}; "
+    "done; true"
+)
+
+# Single-connection HTTP probe using bash's /dev/tcp (no interpreter startup)
+TCP_PROBE_CMD = (
+    "timeout 2 bash -c 'exec 3<>/dev/tcp/127.0.0.1/{port} && "
+    "printf \"GET / HTTP/1.0\\r\\n\\r\\n\" >&3 && head -1 <&3' 2>/dev/null || true"
+)
+HTTP_STATUS_RE = re.compile(r"^HTTP/\d(?:\.\d)? (\d{3})")
+
+# Health check budget (seconds) and when to peek at app.log for early crashes
+HEALTH_CHECK_TIMEOUT = 60
+EARLY_LOG_CHECK_AFTER = 5
+# app.log output that means the backend died during startup, so waiting out the budget is pointless
+SERVER_CRASH_RE = re.compile(
+    r"Traceback \(most recent call last\)|Application startup failed|Error loading ASGI app|Address already in use"
+)
+
+def _error_alternation(patterns: list):
+    """One case-insensitive regex for all patterns; group e<i> is patterns[i]."""
+    return re.compile("|".join(f"(?P<e{i}>{pattern})" for i, (pattern, _) in enumerate(patterns)), re.IGNORECASE)
+
+# Sandbox log patterns for the self-healing loop (_detect_errors). The earliest error in the
+# logs decides the type (usually the root cause); when several match there, the first listed wins
+ERROR_PATTERNS = [
+    # ═══════════════════════════════════════════════════════════
+    # NODE.JS SPECIFIC ERRORS (CRITICAL FOR AUTO-HEALING)
+    # ═══════════════════════════════════════════════════════════
+    (r"Cannot find module", "NODE_MODULE_NOT_FOUND"),
+    (r"Error: Cannot find module", "NODE_MODULE_NOT_FOUND"),
+    (r"MODULE_NOT_FOUND", "NODE_MODULE_NOT_FOUND"),
+    (r"node:internal/modules", "NODE_INTERNAL_ERROR"),
+    (r"throw err;", "NODE_CRASH"),
+    (r"ReferenceError:", "NODE_REFERENCE_ERROR"),
+    (r"Error: listen EADDRINUSE", "NODE_PORT_IN_USE"),
+    (r"ENOENT: no such file", "NODE_FILE_NOT_FOUND"),
+    (r"SyntaxError: Unexpected", "NODE_SYNTAX_ERROR"),
+    (r"Error: ENOENT", "NODE_FILE_NOT_FOUND"),
+    
+    # Server Failures
+    (r"No such file or directory", "FILE_NOT_FOUND"),
+    (r"can't open file", "FILE_NOT_FOUND"),
+    
+    # Build Errors
+    (r"npm ERR!", "NPM_ERROR"),
+    (r"error TS\d+:", "TYPESCRIPT_ERROR"),
+    (r"SyntaxError:", "SYNTAX_ERROR"),
+    (r"Module not found", "MODULE_NOT_FOUND"),
+    
+    # Sandbox Errors
+    (r"Command exited with code [^0]", "COMMAND_FAILED"),
+    (r"syntax error near unexpected token", "BASH_SYNTAX_ERROR"),
+    (r"mkdir.*failed", "MKDIR_ERROR"),
+    (r"Permission denied", "PERMISSION_ERROR"),
     
-    result = path
-    for char, replacement in replacements.items():
-        result = result.replace(char, replacement)
+    # Python Errors  
+    (r"ModuleNotFoundError:", "PYTHON_IMPORT_ERROR"),
+    (r"ImportError:", "PYTHON_IMPORT_ERROR"),
+    (r"IndentationError:", "PYTHON_SYNTAX_ERROR"),
+    (r"NameError:", "PYTHON_NAME_ERROR"),
+    (r"TypeError:", "PYTHON_TYPE_ERROR"),
+    (r"FileNotFoundError:", "PYTHON_FILE_NOT_FOUND"),
     
-    # Remove any double underscores
-    while '__' in result:
-        result = result.replace('__', '_')
+    # Connection Errors
+    (r"ECONNREFUSED", "CONNECTION_ERROR"),
+    (r"Failed to connect", "CONNECTION_ERROR"),
+    (r"Backend connection failed", "BACKEND_ERROR"),
     
-    # Remove any double slashes
-    while '//' in result:
-        result = result.replace('//', '/')
+    # Generation Errors
+    (r"GENERATION FAILED", "GENERATION_ERROR"),
+    (r"No files were generated", "EMPTY_GENERATION"),
     
-    return result
+    # MongoDB/Database Errors
+    (r"MongoNetworkError", "DATABASE_CONNECTION_ERROR"),
+    (r"MongoServerError", "DATABASE_ERROR"),
+    (r"ECONNREFUSED.*27017", "MONGODB_CONNECTION_ERROR"),
+]
+ERROR_RE = _error_alternation(ERROR_PATTERNS)
+# execute_in_sandbox's own status lines, which come before the app/build log they summarize:
+# only used when that log holds no specific error
+STATUS_ERROR_PATTERNS = [
+    (r"FATAL: Node\.js Backend failed", "NODE_SERVER_CRASH"),
+    (r"FATAL: Backend failed", "BACKEND_CRASH"),
+    (r"Backend failed to start", "BACKEND_STARTUP_FAILED"),
+    (r"FRONTEND BUILD FAILED", "FRONTEND_BUILD_ERROR"),
+    (r"Sandbox Error:", "SANDBOX_ERROR"),
+]
+STATUS_ERROR_RE = _error_alternation(STATUS_ERROR_PATTERNS)
+
+# Output of the background frontend npm install
+NPM_INSTALL_LOG = "/tmp/npm_install.log"
+
+# Bytes fetched when reading a Sandbox log for diagnostics
+LOG_TAIL_BYTES = 4096
+# Upper bound on waiting for a started frontend to answer on port 3000
+FRONTEND_BOOT_TIMEOUT = 10
+
+# Concurrent sandbox file writes when the bundle upload is unavailable
+UPLOAD_WORKERS = 16
+
+# Below this many .py files, infer_dependencies parses serially
+PARALLEL_INFER_MIN_FILES = 20
+
+# Concurrent GitHub content fetches during scan_repository_deep
+GITHUB_FETCH_WORKERS = 20
+
+# Blob texts requested per GitHub GraphQL query (aliased object lookups)
+GRAPHQL_BATCH_SIZE = 100
+
+# Concurrent blob creations in commit_all_files_to_github
+GITHUB_BLOB_WORKERS = 10
+
+# Pooled GitHub session: keep-alive connections, retries on rate limits / gateway errors
+GITHUB_POOL_CONNECTIONS = 20
+GITHUB_POOL_MAXSIZE = 50
+GITHUB_RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503])
+
+# Default branch / tree lookups are reused across scan and commit for this long (seconds)
+REPO_META_TTL = 300
+# Blob SHAs of files on the resurrection branch, so repeated single-file commits skip the lookup
+FILE_SHA_TTL = 120
+
+# Pooled Gemini session; retries stay in _request_gemini's own loop
+GEMINI_POOL_CONNECTIONS = 8
+GEMINI_POOL_MAXSIZE = 32
+# (connect, read) seconds; code generation can take minutes before the first byte
+GEMINI_TIMEOUT = (10, 600)
+# Longest single wait between 429/5xx retries (seconds)
+GEMINI_MAX_RETRY_WAIT = 60
+# Request bodies above this size are sent gzip-compressed (source text shrinks 5-10x)
+GEMINI_GZIP_MIN_BYTES = 16 * 1024
+
+# Gemini context cache for the repository files shared by the planner, coder and auto-heal retries
+CONTEXT_CACHE_TTL = 600
+# Below this the API rejects the cache (minimum token count), so the files are sent inline
+CONTEXT_CACHE_MIN_CHARS = 16000
+
+# Successful Gemini responses are reused for identical prompts within this window (seconds)
+LLM_CACHE_TTL = 3600
+# Sampling temperature for the modernization plan. None keeps the API default (sampled,
+# never cached); 0 makes plans deterministic, so a repeat run of the same repo + vibe reuses one
+PLAN_TEMPERATURE = None
+
+# On-disk exact-match cache for Gemini responses (survives restarts)
+LLM_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.db")
+LLM_CACHE_DB_TTL = 7 * 24 * 3600
+# Responses (whole generated codebases) are stored zlib-compressed at this level
+LLM_CACHE_DB_COMPRESSLEVEL = 6
+# On-disk GitHub conditional-GET cache (URL -> ETag + body), so restarts still revalidate for free
+GITHUB_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "github_cache.db")
+# Entries older than this are ignored rather than revalidated
+GITHUB_CACHE_DB_TTL = 7 * 24 * 3600
+# Bump when prompts.py changes meaningfully so stale responses stop matching
+PROMPT_VERSION = "2"
+
+# Statement-list fields that can hold nested imports (if/try/with/def/class/match bodies)
+STMT_CONTAINER_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+def _iter_import_nodes(body):
+    """
+    Yields every Import/ImportFrom in a statement list, recursing only through
+    nested statement blocks (imports can't live inside expressions, so those are skipped).
+    """
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
+            continue
+        for field in STMT_CONTAINER_FIELDS:
+            children = getattr(node, field, None)
+            if isinstance(children, list):
+                yield from _iter_import_nodes(children)
+
+def _infer_packages_from_source(content: str):
+    """
+    Returns the set of PyPI packages imported by one Python source file,
+    or None if the file does not parse. Module-level so it can run in a process pool.
+    """
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return None
+
+    detected = set()
+    for node in _iter_import_nodes(tree.body):
+        # Scan "import x"
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                pkg = PACKAGE_MAP.get(alias.name.partition('.')[0])
+                if pkg:
+                    detected.add(pkg)
+        
+        # Scan "from x import y"
+        elif isinstance(node, ast.ImportFrom):
+            if node.module:
+                root = node.module.partition('.')[0]
+                pkg = PACKAGE_MAP.get(root)
+                if pkg:
+                    detected.add(pkg)
+                
+                # SPECIAL CASE: Pydantic Email
+                if root == "pydantic":
+                    for name in node.names:
+                        if name.name == "EmailStr":
+                            detected.add("pydantic[email]")
+                            detected.add("email-validator")
+    return detected
+
+def merge_requirements(requirements_text: str, inferred) -> list:
+    """
+    Merges requirements.txt lines with inferred packages into one install list.
+    Any bcrypt entry is dropped and BCRYPT_PIN is appended last so it wins.
+    Inferred packages already named in requirements.txt are left to its (pinned) line.
+    Option lines (-r, -c, -e, --index-url, ...) are dropped: in the merged file they
+    would resolve relative to /tmp instead of the original requirements.txt.
+    """
+    merged = []
+    seen = set()
+    required_names = set()
+    lines = [(line, False) for line in requirements_text.splitlines()] + [(line, True) for line in sorted(inferred)]
+    for line, is_inferred in lines:
+        line = line.strip()
+        if not line or line.startswith(('#', '-')) or line in seen:
+            continue
+        name = re.split(r"[\s\[<>=!~;@]", line, maxsplit=1)[0].lower()
+        if name == "bcrypt":
+            continue
+        # PEP 503 normalization, so Flask_Cors and flask-cors are the same package
+        name = re.sub(r"[-_.]+", "-", name)
+        if is_inferred and name in required_names:
+            continue
+        seen.add(line)
+        if not is_inferred:
+            required_names.add(name)
+        merged.append(line)
+    merged.append(BCRYPT_PIN)
+    return merged
+
+def _parse_json(data):
+    """json.loads for str or bytes, via orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _gemini_body(data: dict):
+    """
+    Serializes a Gemini request once, so retries resend the same bytes.
+    Returns (body, headers), gzip-compressed when larger than GEMINI_GZIP_MIN_BYTES.
+    """
+    body = orjson.dumps(data) if orjson is not None else json.dumps(data).encode("utf-8")
+    headers = {'Content-Type': 'application/json'}
+    if len(body) > GEMINI_GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=BUNDLE_COMPRESSLEVEL)
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
+
+def _json_loads(resp):
+    """resp.json(), via orjson when available (tree listings and Gemini responses run to megabytes)."""
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
+
+def _worth_scanning(path: str, size: int, head: bytes = b"") -> bool:
+    """Size/binary guard for deep scan: cheap checks before any decode or analysis."""
+    if size > MAX_SCAN_FILE_BYTES and os.path.basename(path) not in IMPORTANT_FILES:
+        return False
+    return b"\x00" not in head[:BINARY_SNIFF_BYTES]
+
+def parse_generated_files(response: str) -> list:
+    """
+    Extracts [{"filename", "content"}] from the model's <file path="...">...</file> blocks.
+    Linear scan: regex for the opening tag, str.find for the matching close.
+    """
+    files = []
+    pos = 0
+    while True:
+        match = FILE_OPEN_RE.search(response, pos)
+        if not match:
+            break
+        end = response.find(FILE_CLOSE_TAG, match.end())
+        if end == -1:
+            break
+        files.append({
+            "filename": match.group(1).strip(),
+            "content": response[match.end():end].strip()
+        })
+        pos = end + len(FILE_CLOSE_TAG)
+    return files
+
+def bullet_list(items: list, limit: int = PLAN_LIST_LIMIT) -> str:
+    """'- item' lines for the first `limit` items, noting how many more were left out."""
+    lines = ['- ' + item for item in islice(items, limit)]
+    if len(items) > limit:
+        lines.append(f"- (+{len(items) - limit} more not shown)")
+    return "\n".join(lines)
+
+def backoff_delays(initial: float = 0.2, cap: float = 1.0):
+    """Yields poll delays that grow quickly from `initial` and then stay at `cap`."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(cap, round(delay * 1.6, 2))
 
 class LazarusEngine:
     def __init__(self):
@@ -81,9 +576,160 @@ class LazarusEngine:
         self.planner_model = "gemini-3-flash-preview"
         self.coder_model = "gemini-3-pro-preview" 
         self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
+        # One pooled session for every GitHub API call (avoids a TLS handshake per request)
+        self._http = requests.Session()
+        self._http.headers.update({"Accept": "application/vnd.github.v3+json"})
+        adapter = HTTPAdapter(pool_connections=GITHUB_POOL_CONNECTIONS, pool_maxsize=GITHUB_POOL_MAXSIZE,
+                              max_retries=GITHUB_RETRY)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+        # Separate keep-alive session for Gemini (plan, code-gen and retries share one TLS connection)
+        self._gemini_http = requests.Session()
+        self._gemini_http.mount("https://", HTTPAdapter(pool_connections=GEMINI_POOL_CONNECTIONS,
+                                                        pool_maxsize=GEMINI_POOL_MAXSIZE, max_retries=0))
+        # Per-file log lines in hot loops are only printed with LAZARUS_VERBOSE=1
+        self.verbose = os.getenv("LAZARUS_VERBOSE") == "1"
         
         # E2B Persistence
         self.sandbox = None
+        self._sandbox_state = "none"  # "none" | "live" | "dying"
+        self._sandbox_expires_at = 0.0  # time.monotonic() when E2B will have reaped it
+        # Sandbox cold start overlaps with the Gemini plan/code calls
+        self._warmup_pool = ThreadPoolExecutor(max_workers=1)
+        self._sandbox_warmup = None
+        self._sandbox_fresh = False  # acquired/reset by the warmup, not yet used by a deploy
+        atexit.register(self._retire_sandbox)
+        # Warm-sandbox bookkeeping (what the last deploy left behind)
+        self._background_processes = []
+        self._deployed_roots = set()
+        self._installed_reqs = set()
+        self._npm_installed = {}  # frontend dir -> sha256 of package.json + lockfile
+        self._npm_pending = {}
+        self._tcp_probe = True
+        # sha256(source) -> inferred packages (None on SyntaxError)
+        self._infer_cache = {}
+        # Created on first large scan, then kept so auto-heal retries skip worker startup
+        self._infer_pool = None
+        # sha256(namespace, model, prompt) -> (expires_at, response)
+        self._llm_cache = {}
+        # ("branch", owner, repo) / ("tree", owner, repo, ref) -> (expires_at, value)
+        self._repo_meta_cache = {}
+        # (owner, repo, branch, path) -> (expires_at, blob sha), refreshed by our own PUTs
+        self._file_sha_cache = {}
+        # GitHub URL -> (ETag, parsed body); a 304 revalidation is free against the rate limit
+        self._etag_cache = {}
+        # "model:sha256(prefix)" -> (expires_at, cachedContents/... name)
+        self._context_caches = {}
+        # (deep_scan_result, original files block, its sha256) for the current resurrection;
+        # the planner and every auto-heal attempt reuse the same block and digest
+        self._files_context = (None, None, "")
+
+    def _repo_meta_get(self, key):
+        cached = self._repo_meta_cache.get(key)
+        if cached and cached[0] > time.time():
+            return cached[1]
+        return None
+
+    def _repo_meta_put(self, key, value):
+        self._repo_meta_cache[key] = (time.time() + REPO_META_TTL, value)
+
+    def _forget_file_shas(self, owner: str, repo_name: str, branch: str):
+        """Drops cached file SHAs for a branch whose ref we just moved."""
+        prefix = (owner.lower(), repo_name.lower(), branch)
+        for key in [k for k in self._file_sha_cache if k[:3] == prefix]:
+            del self._file_sha_cache[key]
+
+    def _conditional_get_json(self, url: str, headers: dict):
+        """
+        GETs url as JSON, sending If-None-Match when we hold an ETag for it.
+        Returns (status_code, body); a 304 is answered from the cache as (200, body).
+        """
+        cached = self._etag_cache.get(url)
+        if cached is None:
+            cached = self._github_db_get(url)
+            if cached:
+                self._etag_cache[url] = cached
+        if cached:
+            headers = {**headers, "If-None-Match": cached[0]}
+        
+        resp = self._http.get(url, headers=headers)
+        if resp.status_code == 304 and cached:
+            return 200, cached[1]
+        if resp.status_code != 200:
+            return resp.status_code, None
+        
+        body = _json_loads(resp)
+        etag = resp.headers.get("ETag")
+        if etag:
+            self._etag_cache[url] = (etag, body)
+            self._github_db_put(url, etag, resp.content)
+        return 200, body
+
+    def _github_db(self):
+        conn = sqlite3.connect(GITHUB_CACHE_DB, timeout=5)
+        # WAL: readers (other requests, populate runs) don't block the writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS github_cache ("
+            "url TEXT PRIMARY KEY, etag TEXT, body BLOB, fetched_at REAL)"
+        )
+        return conn
+
+    def _github_db_get(self, url: str):
+        """(ETag, parsed body) stored for url by an earlier run, or None."""
+        try:
+            with self._github_db() as conn:
+                row = conn.execute(
+                    "SELECT etag, body FROM github_cache WHERE url = ? AND fetched_at > ?",
+                    (url, time.time() - GITHUB_CACHE_DB_TTL)
+                ).fetchone()
+            if not row:
+                return None
+            raw = zlib.decompress(row[1])
+            return row[0], (orjson.loads(raw) if orjson is not None else json.loads(raw))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            print(f"[!] GitHub cache read failed: {e}")
+            return None
+
+    def _github_db_put(self, url: str, etag: str, raw_body: bytes):
+        try:
+            with self._github_db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO github_cache VALUES (?, ?, ?, ?)",
+                    (url, etag, zlib.compress(raw_body, LLM_CACHE_DB_COMPRESSLEVEL), time.time())
+                )
+        except sqlite3.Error as e:
+            print(f"[!] GitHub cache write failed: {e}")
+
+    def _get_default_branch(self, owner: str, repo_name: str, headers: dict) -> str:
+        """Default branch of owner/repo (cached for REPO_META_TTL), 'main' if the lookup fails."""
+        key = ("branch", owner.lower(), repo_name.lower())
+        branch = self._repo_meta_get(key)
+        if branch:
+            return branch
+        
+        status, repo_info = self._conditional_get_json(f"https://api.github.com/repos/{owner}/{repo_name}", headers)
+        if status != 200:
+            return "main"
+        branch = repo_info.get('default_branch') or 'main'
+        self._repo_meta_put(key, branch)
+        return branch
+
+    def _get_tree(self, owner: str, repo_name: str, ref: str, headers: dict):
+        """Recursive git tree entries for ref (cached for REPO_META_TTL), or None on failure."""
+        key = ("tree", owner.lower(), repo_name.lower(), ref)
+        tree = self._repo_meta_get(key)
+        if tree is not None:
+            return tree
+        
+        tree_url = f"https://api.github.com/repos/{owner}/{repo_name}/git/trees/{ref}?recursive=1"
+        status, tree_info = self._conditional_get_json(tree_url, headers)
+        if status != 200:
+            print(f"[!] Failed to get repository tree for {ref}: {status}")
+            return None
+        tree = tree_info.get('tree', [])
+        self._repo_meta_put(key, tree)
+        return tree
 
     def commit_to_github(self, repo_url: str, filename: str, content: str) -> dict:
         """
@@ -95,7 +741,7 @@ class LazarusEngine:
 
         try:
             # Parse owner/repo
-            match = re.search(r"github\.com/([^/]+)/([^/.]+)", repo_url)
+            match = GITHUB_URL_RE.search(repo_url)
             if not match:
                 return {"status": "error", "message": "Invalid GitHub URL."}
             
@@ -106,41 +752,49 @@ class LazarusEngine:
                 "Accept": "application/vnd.github.v3+json"
             }
             target_branch = "lazarus-resurrection"
+            # Fork point and PR base (cached lookup, so resolving it on every commit is cheap)
+            base_branch = self._get_default_branch(owner, repo_name, headers)
 
             # 1. Check if target branch exists
-            branch_resp = requests.get(f"{base_api}/git/ref/heads/{target_branch}", headers=headers)
+            branch_resp = self._http.get(f"{base_api}/git/ref/heads/{target_branch}", headers=headers)
             
             if branch_resp.status_code == 404:
-                # Branch doesn't exist, create it from main
-                print(f"[*] Branch {target_branch} not found. Creating from main...")
-                main_resp = requests.get(f"{base_api}/git/ref/heads/main", headers=headers)
+                # Branch doesn't exist, create it from the default branch
+                print(f"[*] Branch {target_branch} not found. Creating from {base_branch}...")
+                main_resp = self._http.get(f"{base_api}/git/ref/heads/{base_branch}", headers=headers)
                 if main_resp.status_code != 200:
-                    return {"status": "error", "message": "Could not find main branch to fork from."}
+                    return {"status": "error", "message": f"Could not find {base_branch} branch to fork from."}
                 
                 main_sha = main_resp.json()['object']['sha']
                 
-                create_resp = requests.post(
+                create_resp = self._http.post(
                     f"{base_api}/git/refs",
                     headers=headers,
                     json={"ref": f"refs/heads/{target_branch}", "sha": main_sha}
                 )
                 if create_resp.status_code != 201:
                     return {"status": "error", "message": f"Failed to create branch: {create_resp.text}"}
+                self._forget_file_shas(owner, repo_name, target_branch)
             
             elif branch_resp.status_code != 200:
                  return {"status": "error", "message": f"Error checking branch: {branch_resp.text}"}
 
             # 2. Get file SHA in target branch (if exists) for update
-            file_api = f"{base_api}/contents/{filename}?ref={target_branch}"
-            sha = None
-            file_resp = requests.get(file_api, headers=headers)
-            if file_resp.status_code == 200:
-                sha = file_resp.json().get('sha')
+            sha_key = (owner.lower(), repo_name.lower(), target_branch, filename)
+            cached = self._file_sha_cache.get(sha_key)
+            if cached and cached[0] > time.time():
+                sha = cached[1]
+            else:
+                file_api = f"{base_api}/contents/{filename}?ref={target_branch}"
+                sha = None
+                file_resp = self._http.get(file_api, headers=headers)
+                if file_resp.status_code == 200:
+                    sha = file_resp.json().get('sha')
 
             # 3. Commit File
             import base64
-            content_bytes = content.encode('utf-8')
-            base64_content = base64.b64encode(content_bytes).decode('utf-8')
+            # base64 output is pure ASCII; no intermediate bytes kept alive
+            base64_content = base64.b64encode(content.encode('utf-8')).decode('ascii')
 
             data = {
                 "message": f"Lazarus Resurrection: {filename}",
@@ -150,17 +804,21 @@ class LazarusEngine:
             if sha:
                 data["sha"] = sha
 
-            put_resp = requests.put(f"{base_api}/contents/{filename}", headers=headers, json=data)
+            put_resp = self._http.put(f"{base_api}/contents/{filename}", headers=headers, json=data)
             
             if put_resp.status_code in [200, 201]:
+                # Our PUT just set the file's SHA; remember it for the next commit of this file
+                new_sha = (put_resp.json().get('content') or {}).get('sha')
+                if new_sha:
+                    self._file_sha_cache[sha_key] = (time.time() + FILE_SHA_TTL, new_sha)
                 # 4. Create Pull Request
                 print(f"[*] File committed. Creating Pull Request...")
                 
                 # Check if PR already exists
-                pr_check_resp = requests.get(
+                pr_check_resp = self._http.get(
                     f"{base_api}/pulls",
                     headers=headers,
-                    params={"head": f"{owner}:{target_branch}", "base": "main", "state": "open"}
+                    params={"head": f"{owner}:{target_branch}", "base": base_branch, "state": "open"}
                 )
                 
                 if pr_check_resp.status_code == 200 and len(pr_check_resp.json()) > 0:
@@ -177,10 +835,10 @@ class LazarusEngine:
                     "title": "🧬 Lazarus Resurrection - Modernized Codebase",
                     "body": "## 🦾 Automated Resurrection by Lazarus Engine\n\nThis PR contains the modernized version of your legacy codebase.\n\n### Changes:\n- ✅ Modern FastAPI backend with CORS, validation, and JWT auth\n- ✅ Next.js 15 frontend with Tailwind CSS\n- ✅ Production-ready code with error handling\n- ✅ Docker Compose for easy deployment\n\n---\n*Generated by [Lazarus Engine](https://github.com/ArunN2005/lazarus-hackathon)*",
                     "head": target_branch,
-                    "base": "main"
+                    "base": base_branch
                 }
                 
-                pr_resp = requests.post(f"{base_api}/pulls", headers=headers, json=pr_data)
+                pr_resp = self._http.post(f"{base_api}/pulls", headers=headers, json=pr_data)
                 
                 if pr_resp.status_code == 201:
                     pr_url = pr_resp.json()['html_url']
@@ -206,6 +864,8 @@ class LazarusEngine:
                         "message": f"Files committed. PR creation failed: {pr_resp.text[:100]}"
                     }
             else:
+                # Most likely a stale SHA (409); look it up again next time
+                self._file_sha_cache.pop(sha_key, None)
                 return {"status": "error", "message": f"GitHub API Error: {put_resp.text}"}
 
         except Exception as e:
@@ -223,7 +883,7 @@ class LazarusEngine:
             import base64
             
             # Parse owner/repo
-            match = re.search(r"github\.com/([^/]+)/([^/.]+)", repo_url)
+            match = GITHUB_URL_RE.search(repo_url)
             if not match:
                 return {"status": "error", "message": "Invalid GitHub URL."}
             
@@ -237,23 +897,22 @@ class LazarusEngine:
 
             print(f"[*] Creating PR for {len(files)} files...")
 
-            # 1. Get the base branch (try main, then master)
-            base_branch = "main"
-            main_resp = requests.get(f"{base_api}/git/ref/heads/main", headers=headers)
-            if main_resp.status_code != 200:
-                main_resp = requests.get(f"{base_api}/git/ref/heads/master", headers=headers)
-                base_branch = "master"
-                if main_resp.status_code != 200:
-                    return {"status": "error", "message": "Could not find main or master branch."}
+            # 1. Get the base branch (repo default, then main, then master)
+            for base_branch in dict.fromkeys([self._get_default_branch(owner, repo_name, headers), "main", "master"]):
+                main_resp = self._http.get(f"{base_api}/git/ref/heads/{base_branch}", headers=headers)
+                if main_resp.status_code == 200:
+                    break
+            else:
+                return {"status": "error", "message": "Could not find main or master branch."}
             
             base_sha = main_resp.json()['object']['sha']
 
             # 2. Create or update the target branch
-            branch_resp = requests.get(f"{base_api}/git/ref/heads/{target_branch}", headers=headers)
+            branch_resp = self._http.get(f"{base_api}/git/ref/heads/{target_branch}", headers=headers)
             
             if branch_resp.status_code == 404:
                 print(f"[*] Creating branch '{target_branch}'...")
-                create_resp = requests.post(
+                create_resp = self._http.post(
                     f"{base_api}/git/refs",
                     headers=headers,
                     json={"ref": f"refs/heads/{target_branch}", "sha": base_sha}
@@ -263,45 +922,49 @@ class LazarusEngine:
             else:
                 # Update existing branch to latest base
                 print(f"[*] Updating branch '{target_branch}'...")
-                requests.patch(
+                self._http.patch(
                     f"{base_api}/git/refs/heads/{target_branch}",
                     headers=headers,
                     json={"sha": base_sha, "force": True}
                 )
+            # The branch now points somewhere new, so any cached file SHAs on it are stale
+            self._forget_file_shas(owner, repo_name, target_branch)
 
             # 3. Get the base tree
-            base_commit_resp = requests.get(f"{base_api}/git/commits/{base_sha}", headers=headers)
+            base_commit_resp = self._http.get(f"{base_api}/git/commits/{base_sha}", headers=headers)
             base_tree_sha = base_commit_resp.json()['tree']['sha']
 
-            # 4. Create blobs for each file
-            tree_items = []
-            for f in files:
-                content_bytes = f['content'].encode('utf-8')
-                base64_content = base64.b64encode(content_bytes).decode('utf-8')
+            # 4. Create blobs for each file (independent requests, so run them concurrently)
+            def _upload_blob(f):
+                # base64 output is pure ASCII; no intermediate bytes kept alive
+                base64_content = base64.b64encode(f['content'].encode('utf-8')).decode('ascii')
                 
-                blob_resp = requests.post(
+                blob_resp = self._http.post(
                     f"{base_api}/git/blobs",
                     headers=headers,
                     json={"content": base64_content, "encoding": "base64"}
                 )
                 
                 if blob_resp.status_code == 201:
-                    blob_sha = blob_resp.json()['sha']
-                    tree_items.append({
+                    print(f"  [+] Staged: {f['filename']}")
+                    return {
                         "path": f['filename'],
                         "mode": "100644",
                         "type": "blob",
-                        "sha": blob_sha
-                    })
-                    print(f"  [+] Staged: {f['filename']}")
-                else:
-                    print(f"  [!] Failed to create blob for {f['filename']}")
+                        "sha": blob_resp.json()['sha']
+                    }
+                print(f"  [!] Failed to create blob for {f['filename']}")
+                return None
+
+            # map() keeps tree_items in file order
+            with ThreadPoolExecutor(max_workers=GITHUB_BLOB_WORKERS) as ex:
+                tree_items = [t for t in ex.map(_upload_blob, files) if t]
 
             if not tree_items:
                 return {"status": "error", "message": "No files were staged."}
 
             # 5. Create a new tree
-            tree_resp = requests.post(
+            tree_resp = self._http.post(
                 f"{base_api}/git/trees",
                 headers=headers,
                 json={"base_tree": base_tree_sha, "tree": tree_items}
@@ -313,7 +976,7 @@ class LazarusEngine:
             new_tree_sha = tree_resp.json()['sha']
 
             # 6. Create a commit
-            commit_resp = requests.post(
+            commit_resp = self._http.post(
                 f"{base_api}/git/commits",
                 headers=headers,
                 json={
@@ -330,7 +993,7 @@ class LazarusEngine:
             print(f"[*] Created commit: {new_commit_sha[:7]}")
 
             # 7. Update the branch reference
-            update_resp = requests.patch(
+            update_resp = self._http.patch(
                 f"{base_api}/git/refs/heads/{target_branch}",
                 headers=headers,
                 json={"sha": new_commit_sha}
@@ -340,7 +1003,7 @@ class LazarusEngine:
                 return {"status": "error", "message": f"Failed to update branch: {update_resp.text}"}
 
             # 8. Check if PR already exists
-            pr_check_resp = requests.get(
+            pr_check_resp = self._http.get(
                 f"{base_api}/pulls",
                 headers=headers,
                 params={"head": f"{owner}:{target_branch}", "base": base_branch, "state": "open"}
@@ -357,28 +1020,16 @@ class LazarusEngine:
             # 9. Create new PR
             pr_data = {
                 "title": "🧬 Lazarus Resurrection - Modernized Codebase",
-                "body": f"""## 🦾 Automated Resurrection by Lazarus Engine
-
-This PR contains the **completely modernized** version of your legacy codebase.
-
-### 📁 Files Changed ({len(files)} files)
-{chr(10).join([f"- `{f['filename']}`" for f in files[:20]])}
-{"..." if len(files) > 20 else ""}
-
-### ✨ What's Included
-- ✅ Modern FastAPI backend with CORS and validation
-- ✅ Next.js 15 frontend with Tailwind CSS
-- ✅ Production-ready code with error handling
-- ✅ Docker Compose for deployment  
-- ✅ TypeScript types and Pydantic models
-
----
-*Generated by [Lazarus Engine](https://github.com/ArunN2005/lazarus-hackathon) 🧬*""",
+                "body": PR_BODY_TEMPLATE.format(
+                    n=len(files),
+                    file_list_md="\n".join(f"- `{f['filename']}`" for f in islice(files, PR_BODY_MAX_FILES)),
+                    truncated="..." if len(files) > PR_BODY_MAX_FILES else ""
+                ),
                 "head": target_branch,
                 "base": base_branch
             }
             
-            pr_resp = requests.post(f"{base_api}/pulls", headers=headers, json=pr_data)
+            pr_resp = self._http.post(f"{base_api}/pulls", headers=headers, json=pr_data)
             
             if pr_resp.status_code == 201:
                 pr_url = pr_resp.json()['html_url']
@@ -405,44 +1056,143 @@ This PR contains the **completely modernized** version of your legacy codebase.
         """ Fetches the file tree of the remote repository using GitHub API. """
         try:
             # Parse owner/repo
-            match = re.search(r"github\.com/([^/]+)/([^/.]+)", repo_url)
+            match = GITHUB_URL_RE.search(repo_url)
             if not match:
                 return ["(Invalid URL - Simulating Scan)"]
             
             owner, repo_name = match.groups()
             
-            # Try both 'main' and 'master' branches
-            branches = ['main', 'master']
-            
             headers = {"Accept": "application/vnd.github.v3+json"}
             if self.github_token:
                 headers["Authorization"] = f"token {self.github_token}"
             
-            for branch in branches:
-                api_url = f"https://api.github.com/repos/{owner}/{repo_name}/git/trees/{branch}?recursive=1"
-                
-                resp = requests.get(api_url, headers=headers)
-                if resp.status_code == 200:
-                    tree = resp.json().get('tree', [])
+            # Default branch first, then the usual suspects
+            default_branch = self._get_default_branch(owner, repo_name, headers)
+            for branch in dict.fromkeys([default_branch, 'main', 'master']):
+                tree = self._get_tree(owner, repo_name, branch, headers)
+                if tree is not None:
                     # Return list of paths
                     return [item['path'] for item in tree if item['type'] == 'blob']
             
-            # If both branches failed, try to get default branch from repo info
-            repo_api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
-            repo_resp = requests.get(repo_api_url, headers=headers)
-            if repo_resp.status_code == 200:
-                default_branch = repo_resp.json().get('default_branch', 'main')
-                api_url = f"https://api.github.com/repos/{owner}/{repo_name}/git/trees/{default_branch}?recursive=1"
-                resp = requests.get(api_url, headers=headers)
-                if resp.status_code == 200:
-                    tree = resp.json().get('tree', [])
-                    return [item['path'] for item in tree if item['type'] == 'blob']
-            
             return [f"(API Error - Could not find repository or branch)"]
                  
         except Exception as e:
             return [f"(Scan Error: {str(e)})"]
 
+    def _fetch_repo_tarball(self, owner: str, repo_name: str, ref: str, headers: dict, should_fetch) -> list:
+        """
+        Downloads the repository tarball once and returns [(path, content)]
+        for every member accepted by should_fetch, or None if the download failed.
+        """
+        tarball_url = f"https://api.github.com/repos/{owner}/{repo_name}/tarball/{ref}"
+        try:
+            with self._http.get(tarball_url, headers=headers, stream=True, timeout=60) as resp:
+                if resp.status_code != 200:
+                    print(f"[!] Tarball download failed ({resp.status_code}), falling back to per-file fetch")
+                    return None
+                
+                print(f"[*] Deep scanning {owner}/{repo_name}@{ref} from tarball...")
+                fetched = []
+                with tarfile.open(fileobj=resp.raw, mode="r|gz") as tar:
+                    for member in tar:
+                        if not member.isfile():
+                            continue
+                        # Members are prefixed with "<owner>-<repo>-<sha>/"
+                        path = member.name.split("/", 1)[-1]
+                        if not should_fetch(path) or not _worth_scanning(path, member.size):
+                            continue
+                        f = tar.extractfile(member)
+                        if f is None:
+                            continue
+                        # Sniff the head before pulling the rest of the member out of the stream
+                        head = f.read(BINARY_SNIFF_BYTES)
+                        if not _worth_scanning(path, 0, head):
+                            continue
+                        fetched.append((path, (head + f.read()).decode('utf-8', errors='ignore')))
+                return fetched
+        except Exception as e:
+            print(f"[!] Tarball download error: {e}, falling back to per-file fetch")
+            return None
+
+    def _fetch_blobs_graphql(self, owner: str, repo_name: str, ref: str, paths: list, headers: dict):
+        """
+        Fetches blob texts for paths with GitHub GraphQL, GRAPHQL_BATCH_SIZE per query.
+        Returns {path: text} (binary blobs omitted), or None if any query fails.
+        """
+        texts = {}
+        for start in range(0, len(paths), GRAPHQL_BATCH_SIZE):
+            batch = paths[start:start + GRAPHQL_BATCH_SIZE]
+            fields = "\n".join(
+                f"f{i}: object(expression: {json.dumps(f'{ref}:{path}')}) {{ ... on Blob {{ text isBinary }} }}"
+                for i, path in enumerate(batch)
+            )
+            query = f"query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(repo_name)}) {{\n{fields}\n}} }}"
+            try:
+                resp = self._http.post("https://api.github.com/graphql", headers=headers, json={"query": query})
+                body = _json_loads(resp) if resp.status_code == 200 else {}
+                repository = (body.get("data") or {}).get("repository")
+                if body.get("errors") or repository is None:
+                    print(f"[!] GraphQL batch failed ({resp.status_code}), falling back to contents API")
+                    return None
+            except Exception as e:
+                print(f"[!] GraphQL batch error: {e}, falling back to contents API")
+                return None
+            
+            for i, path in enumerate(batch):
+                blob = repository.get(f"f{i}")
+                if blob and not blob.get("isBinary") and blob.get("text") is not None:
+                    texts[path] = blob["text"]
+        return texts
+
+    def _fetch_repo_files(self, owner: str, repo_name: str, ref: str, headers: dict, should_fetch) -> list:
+        """
+        Fallback for _fetch_repo_tarball: walks the git tree and fetches the
+        accepted files in GraphQL batches (with a token) or through the contents
+        API. Returns None if the tree is unavailable.
+        """
+        import base64
+        
+        tree = self._get_tree(owner, repo_name, ref, headers)
+        if tree is None:
+            return None
+        
+        print(f"[*] Deep scanning {len(tree)} files in repository...")
+        paths_to_fetch = [
+            item['path'] for item in tree
+            if item['type'] == 'blob' and should_fetch(item['path']) and _worth_scanning(item['path'], item.get('size', 0))
+        ]
+        
+        if self.github_token:
+            texts = self._fetch_blobs_graphql(owner, repo_name, ref, paths_to_fetch, headers)
+            if texts is not None:
+                return [(path, texts[path]) for path in paths_to_fetch if path in texts]
+        
+        def fetch_content(path):
+            content_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/{path}?ref={ref}"
+            content_resp = self._http.get(content_url, headers=headers)
+            if content_resp.status_code != 200:
+                return None
+            content_data = _json_loads(content_resp)
+            if content_data.get('encoding') != 'base64':
+                return None
+            data = base64.b64decode(content_data['content'])
+            if not _worth_scanning(path, 0, data):
+                return None
+            return data.decode('utf-8', errors='ignore')
+        
+        # Fetch concurrently (I/O bound), results stay in tree order
+        fetched = []
+        with ThreadPoolExecutor(max_workers=GITHUB_FETCH_WORKERS) as pool:
+            futures = [(path, pool.submit(fetch_content, path)) for path in paths_to_fetch]
+            for path, future in futures:
+                try:
+                    content = future.result()
+                    if content is not None:
+                        fetched.append((path, content))
+                except Exception as e:
+                    print(f"  [!] Error fetching {path}: {e}")
+        return fetched
+
     def scan_repository_deep(self, repo_url: str) -> dict:
         """
         DEEP SCAN: Fetches ALL file CONTENTS, not just paths.
@@ -456,8 +1206,6 @@ This PR contains the **completely modernized** version of your legacy codebase.
             "can_modernize": [...]
         }
         """
-        import base64
-        
         result = {
             "files": [],
             "tech_stack": {
@@ -473,7 +1221,7 @@ This PR contains the **completely modernized** version of your legacy codebase.
         
         try:
             # Parse owner/repo
-            match = re.search(r"github\.com/([^/]+)/([^/.]+)", repo_url)
+            match = GITHUB_URL_RE.search(repo_url)
             if not match:
                 return result
             
@@ -484,91 +1232,54 @@ This PR contains the **completely modernized** version of your legacy codebase.
                 headers["Authorization"] = f"token {self.github_token}"
             
             # Get default branch
-            repo_resp = requests.get(f"https://api.github.com/repos/{owner}/{repo_name}", headers=headers)
-            default_branch = "main"
-            if repo_resp.status_code == 200:
-                default_branch = repo_resp.json().get('default_branch', 'main')
-            
-            # Get file tree
-            tree_url = f"https://api.github.com/repos/{owner}/{repo_name}/git/trees/{default_branch}?recursive=1"
-            tree_resp = requests.get(tree_url, headers=headers)
+            default_branch = self._get_default_branch(owner, repo_name, headers)
             
-            if tree_resp.status_code != 200:
-                print(f"[!] Failed to get repository tree: {tree_resp.status_code}")
-                return result
-            
-            tree = tree_resp.json().get('tree', [])
+            def should_fetch(path):
+                _, ext = os.path.splitext(path)
+                filename = os.path.basename(path)
+                
+                # Skip node_modules, venv, etc.
+                if any(part in SKIP_DIRS for part in path.split('/')):
+                    return False
+                if filename in LOCKFILES:
+                    return False
+                
+                path_lower = path.lower()
+                return (
+                    ext.lower() in CODE_EXTENSIONS or
+                    filename in IMPORTANT_FILES or
+                    'model' in path_lower or
+                    'schema' in path_lower or
+                    'route' in path_lower or
+                    'api' in path_lower or
+                    'controller' in path_lower
+                )
             
-            # File extensions to fetch content for
-            code_extensions = {
-                '.py', '.js', '.ts', '.tsx', '.jsx', '.json', '.yaml', '.yml',
-                '.html', '.css', '.scss', '.md', '.txt', '.env', '.env.example',
-                '.toml', '.cfg', '.ini', '.sql', '.prisma', '.graphql'
-            }
+            # NO LIMIT - Fetch ALL files! Gemini has a large context window.
+            # One tarball download instead of a contents request per file
+            fetched = self._fetch_repo_tarball(owner, repo_name, default_branch, headers, should_fetch)
             
-            # Files to always fetch
-            important_files = {
-                'package.json', 'requirements.txt', 'Pipfile', 'pyproject.toml',
-                'docker-compose.yml', 'docker-compose.yaml', 'Dockerfile',
-                '.env', '.env.example', '.env.local', 'config.py', 'settings.py',
-                'schema.prisma', 'models.py', 'schemas.py', 'database.py'
-            }
+            if fetched is None:
+                fetched = self._fetch_repo_files(owner, repo_name, default_branch, headers, should_fetch)
+                if fetched is None:
+                    return result
             
-            print(f"[*] Deep scanning {len(tree)} files in repository...")
             files_fetched = 0
-            # NO LIMIT - Fetch ALL files! Gemini has a large context window.
-            
-            for item in tree:
-                if item['type'] != 'blob':
-                    continue
-                    
-                path = item['path']
-                _, ext = os.path.splitext(path)
-                filename = os.path.basename(path)
+            for path, content in fetched:
+                # Detect language
+                lang = self._detect_language(path, content)
                 
-                # Check if we should fetch this file
-                should_fetch = (
-                    ext.lower() in code_extensions or
-                    filename in important_files or
-                    'model' in path.lower() or
-                    'schema' in path.lower() or
-                    'route' in path.lower() or
-                    'api' in path.lower() or
-                    'controller' in path.lower()
-                )
+                result["files"].append({
+                    "path": path,
+                    "content": content,
+                    "language": lang
+                })
                 
-                # Skip node_modules, venv, etc.
-                skip_dirs = ['node_modules', 'venv', '.venv', '__pycache__', '.git', 'dist', 'build']
-                if any(skip_dir in path for skip_dir in skip_dirs):
-                    should_fetch = False
+                # Analyze this file for tech stack
+                self._analyze_file_for_tech_stack(path, content, result)
                 
-                if should_fetch:  # Fetch ALL files - no limit!
-                    try:
-                        # Fetch file content
-                        content_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/{path}?ref={default_branch}"
-                        content_resp = requests.get(content_url, headers=headers)
-                        
-                        if content_resp.status_code == 200:
-                            content_data = content_resp.json()
-                            if content_data.get('encoding') == 'base64':
-                                content = base64.b64decode(content_data['content']).decode('utf-8', errors='ignore')
-                                
-                                # Detect language
-                                lang = self._detect_language(path, content)
-                                
-                                result["files"].append({
-                                    "path": path,
-                                    "content": content,
-                                    "language": lang
-                                })
-                                
-                                # Analyze this file for tech stack
-                                self._analyze_file_for_tech_stack(path, content, result)
-                                
-                                files_fetched += 1
-                                print(f"  [+] Fetched: {path}")
-                    except Exception as e:
-                        print(f"  [!] Error fetching {path}: {e}")
+                files_fetched += 1
+                print(f"  [+] Fetched: {path}")
             
             print(f"[*] Deep scan complete: {files_fetched} files analyzed")
             
@@ -583,54 +1294,62 @@ This PR contains the **completely modernized** version of your legacy codebase.
     
     def _detect_language(self, path: str, content: str) -> str:
         """Detect programming language from file path and content."""
-        ext_map = {
-            '.py': 'python', '.js': 'javascript', '.ts': 'typescript',
-            '.tsx': 'typescript-react', '.jsx': 'javascript-react',
-            '.json': 'json', '.yaml': 'yaml', '.yml': 'yaml',
-            '.html': 'html', '.css': 'css', '.sql': 'sql'
-        }
-        _, ext = os.path.splitext(path)
-        return ext_map.get(ext.lower(), 'text')
+        stem, dot, ext = path.rpartition('.')
+        if dot and '/' not in ext:
+            return LANGUAGE_BY_EXT.get(ext.lower(), 'text')
+        # Extensionless scripts: trust the shebang
+        if content.startswith('#!'):
+            shebang = content[:128].partition('\n')[0]
+            if 'python' in shebang:
+                return 'python'
+            if 'node' in shebang:
+                return 'javascript'
+        return 'text'
     
     def _analyze_file_for_tech_stack(self, path: str, content: str, result: dict):
         """Analyze file content to detect tech stack and important patterns."""
         path_lower = path.lower()
-        content_lower = content.lower()
-        
-        # Detect Backend Framework
-        if 'fastapi' in content_lower or 'from fastapi' in content_lower:
-            result["tech_stack"]["backend"]["framework"] = "FastAPI"
-        elif 'flask' in content_lower or 'from flask' in content_lower:
-            result["tech_stack"]["backend"]["framework"] = "Flask"
-        elif 'express' in content_lower or "require('express')" in content_lower:
-            result["tech_stack"]["backend"]["framework"] = "Express.js"
-        elif 'django' in content_lower:
-            result["tech_stack"]["backend"]["framework"] = "Django"
+        hits = {m.group(1).lower() for m in TECH_KEYWORD_RE.finditer(content)}
+        
+        ts = result["tech_stack"]
+        
+        # Detect Backend Framework (first file that names one wins)
+        if ts["backend"]["framework"] is None:
+            if 'fastapi' in hits:
+                ts["backend"]["framework"] = "FastAPI"
+            elif 'flask' in hits:
+                ts["backend"]["framework"] = "Flask"
+            elif 'express' in hits:
+                ts["backend"]["framework"] = "Express.js"
+            elif 'django' in hits:
+                ts["backend"]["framework"] = "Django"
         
         # Detect Database - CRITICAL FOR PRESERVATION
-        if 'mongodb' in content_lower or 'mongoose' in content_lower or 'pymongo' in content_lower:
+        # (not short-circuited: every file with a connection is a preservation target)
+        if hits & {'mongodb', 'mongoose', 'pymongo'}:
             result["tech_stack"]["backend"]["database"] = "MongoDB"
             result["must_preserve"].append(f"MongoDB database connection in {path}")
-        elif 'postgresql' in content_lower or 'psycopg' in content_lower or 'pg.' in content_lower:
+        elif hits & {'postgresql', 'psycopg', 'pg.'}:
             result["tech_stack"]["backend"]["database"] = "PostgreSQL"
             result["must_preserve"].append(f"PostgreSQL database connection in {path}")
-        elif 'mysql' in content_lower or 'pymysql' in content_lower:
+        elif hits & {'mysql', 'pymysql'}:
             result["tech_stack"]["backend"]["database"] = "MySQL"
             result["must_preserve"].append(f"MySQL database connection in {path}")
-        elif 'sqlite' in content_lower:
+        elif 'sqlite' in hits:
             result["tech_stack"]["backend"]["database"] = "SQLite"
-        elif 'prisma' in content_lower or path.endswith('.prisma'):
+        elif 'prisma' in hits or path.endswith('.prisma'):
             result["must_preserve"].append(f"Prisma schema in {path}")
         
-        # Detect Frontend Framework
-        if 'react' in content_lower or 'from react' in content_lower or "'react'" in content_lower:
-            result["tech_stack"]["frontend"]["framework"] = "React"
-        elif 'vue' in content_lower:
-            result["tech_stack"]["frontend"]["framework"] = "Vue.js"
-        elif 'angular' in content_lower:
-            result["tech_stack"]["frontend"]["framework"] = "Angular"
-        elif 'next' in content_lower or "'next'" in content_lower:
-            result["tech_stack"]["frontend"]["framework"] = "Next.js"
+        # Detect Frontend Framework (first file that names one wins)
+        if ts["frontend"]["framework"] is None:
+            if 'react' in hits:
+                ts["frontend"]["framework"] = "React"
+            elif 'vue' in hits:
+                ts["frontend"]["framework"] = "Vue.js"
+            elif 'angular' in hits:
+                ts["frontend"]["framework"] = "Angular"
+            elif 'next' in hits:
+                ts["frontend"]["framework"] = "Next.js"
         
         # Detect API Endpoints - MUST PRESERVE
         if 'model' in path_lower or 'schema' in path_lower:
@@ -640,14 +1359,13 @@ This PR contains the **completely modernized** version of your legacy codebase.
         if '@app.route' in content or '@app.get' in content or '@app.post' in content:
             result["must_preserve"].append(f"API endpoints in {path}")
             # Extract endpoint patterns
-            import re
-            endpoints = re.findall(r'@app\.(get|post|put|delete|patch)\([\'"]([^\'"]+)[\'"]', content)
+            endpoints = ENDPOINT_RE.findall(content)
             for method, endpoint in endpoints:
                 result["api_endpoints"].append(f"{method.upper()} {endpoint}")
         
         # Detect environment variables
         if '.env' in path or 'config' in path_lower:
-            env_vars = re.findall(r'([A-Z_][A-Z0-9_]+)\s*=', content)
+            env_vars = ENV_ASSIGN_RE.findall(content)
             result["env_vars"].extend(env_vars[:10])  # Limit
     
     def _categorize_preservation_targets(self, result: dict):
@@ -677,21 +1395,191 @@ This PR contains the **completely modernized** version of your legacy codebase.
         }
 
 
-    def _call_gemini(self, prompt: str, model: str = None) -> str:
-        """Raw HTTP call to Gemini API to bypass SDK installation issues."""
+    def _original_files_context(self, deep_scan_result: dict):
+        """
+        Returns (get_original_files_context(deep_scan_result) or None, its sha256),
+        built once per scan result instead of once per Gemini call.
+        """
+        scan, block, digest = self._files_context
+        if scan is not deep_scan_result:
+            block = (get_original_files_context(deep_scan_result) if deep_scan_result else "") or None
+            digest = hashlib.sha256(block.encode("utf-8")).hexdigest() if block else ""
+            self._files_context = (deep_scan_result, block, digest)
+        return block, digest
+
+    def _llm_cache_key(self, namespace: str, model: str, prompt: str, temperature: float = None):
+        """
+        sha256 over (namespace, model, prompt, temperature), or None unless the
+        call is deterministic (temperature=0). temperature=None means the API's default
+        sampling temperature, so such responses are never replayed.
+        """
+        if temperature != 0:
+            return None
+        payload = json.dumps(
+            {"ns": namespace or "", "model": model, "prompt": prompt, "temperature": temperature},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _llm_db(self):
+        conn = sqlite3.connect(LLM_CACHE_DB, timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "input_hash TEXT PRIMARY KEY, prompt_version TEXT, response TEXT, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_version ON llm_cache (input_hash, prompt_version)")
+        return conn
+
+    def _llm_db_get(self, cache_key: str):
+        try:
+            with self._llm_db() as conn:
+                row = conn.execute(
+                    "SELECT response FROM llm_cache WHERE input_hash = ? AND prompt_version = ? AND expires_at > ?",
+                    (cache_key, PROMPT_VERSION, time.time())
+                ).fetchone()
+            if not row:
+                return None
+            # Rows written before compression was added hold plain text
+            return zlib.decompress(row[0]).decode("utf-8") if isinstance(row[0], bytes) else row[0]
+        except (sqlite3.Error, zlib.error) as e:
+            print(f"[!] LLM cache read failed: {e}")
+            return None
+
+    def _llm_db_put(self, cache_key: str, response_text: str):
+        try:
+            with self._llm_db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                    (cache_key, PROMPT_VERSION,
+                     zlib.compress(response_text.encode("utf-8"), LLM_CACHE_DB_COMPRESSLEVEL),
+                     time.time() + LLM_CACHE_DB_TTL)
+                )
+        except sqlite3.Error as e:
+            print(f"[!] LLM cache write failed: {e}")
+
+    def _get_context_cache(self, model: str, prefix: str, prefix_digest: str):
+        """
+        Returns a cachedContents name holding prefix for model, creating it on first use.
+        None when the prefix is too small to cache or creation fails (send it inline instead).
+        """
+        now = time.time()
+        for key in [k for k, (expires_at, _) in self._context_caches.items() if expires_at <= now]:
+            del self._context_caches[key]
+        
+        key = f"{model}:{prefix_digest}"
+        if key in self._context_caches:
+            return self._context_caches[key][1]
+        if len(prefix) < CONTEXT_CACHE_MIN_CHARS:
+            return None
+        
+        api_root = self.base_url.rsplit("/models", 1)[0]
+        data = {
+            "model": f"models/{model}",
+            "contents": [{"role": "user", "parts": [{"text": prefix}]}],
+            "ttl": f"{CONTEXT_CACHE_TTL}s"
+        }
+        try:
+            body, headers = _gemini_body(data)
+            resp = self._gemini_http.post(f"{api_root}/cachedContents?key={self.api_key}", data=body,
+                                          headers=headers, timeout=GEMINI_TIMEOUT)
+            if resp.status_code != 200:
+                print(f"[*] Gemini context cache unavailable ({resp.status_code}), sending files inline")
+                return None
+            name = _json_loads(resp)["name"]
+        except Exception as e:
+            print(f"[*] Gemini context cache error: {str(e)[:100]}, sending files inline")
+            return None
+        
+        # Stop using it a minute early so a request never races the server-side expiry
+        self._context_caches[key] = (now + CONTEXT_CACHE_TTL - 60, name)
+        print(f"[*] Gemini context cache created: {name} ({len(prefix)} chars)")
+        return name
+
+    def _call_gemini(self, prompt: str, model: str = None, cache_namespace: str = None,
+                     temperature: float = None, cached_prefix: str = None, cache_if=None) -> str:
+        """
+        Raw HTTP call to Gemini API to bypass SDK installation issues.
+        Successful responses are cached per cache_namespace (the repo URL), so
+        repo A's answers are never served for repo B: in memory for LLM_CACHE_TTL,
+        and on disk (LLM_CACHE_DB) for LLM_CACHE_DB_TTL.
+        cached_prefix (the original repository files) goes ahead of prompt, through
+        a Gemini context cache when possible so it is uploaded and billed once.
+        cache_if, when given, must return True for a response before it is stored,
+        so an answer the caller cannot use is not replayed on the next run.
+        """
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY is missing.")
         
         target_model = model or "gemini-3-flash-preview" # Default fallback
-        url = f"{self.base_url}/{target_model}:generateContent?key={self.api_key}"
+        
+        if cached_prefix is not None and cached_prefix is self._files_context[1]:
+            prefix_digest = self._files_context[2]
+        else:
+            prefix_digest = hashlib.sha256(cached_prefix.encode("utf-8")).hexdigest() if cached_prefix else ""
+        cache_key = self._llm_cache_key(cache_namespace, target_model, prefix_digest + prompt, temperature)
+        if cache_key:
+            cached = self._llm_cache.get(cache_key)
+            if cached and cached[0] > time.time():
+                print(f"[*] Gemini cache hit for model: {target_model}")
+                return cached[1]
+            stored = self._llm_db_get(cache_key)
+            if stored is not None:
+                print(f"[*] Gemini disk cache hit for model: {target_model}")
+                self._llm_cache[cache_key] = (time.time() + LLM_CACHE_TTL, stored)
+                return stored
+        
+        cached_content = None
+        inline_prefix = None
+        if cached_prefix:
+            cached_content = self._get_context_cache(target_model, cached_prefix, prefix_digest)
+            if not cached_content:
+                inline_prefix = cached_prefix
+        
+        response_text = self._request_gemini(prompt, target_model, temperature, cached_content, inline_prefix)
+        if cache_key and not response_text.startswith("[ERROR]") and (cache_if is None or cache_if(response_text)):
+            self._llm_cache[cache_key] = (time.time() + LLM_CACHE_TTL, response_text)
+            self._llm_db_put(cache_key, response_text)
+        return response_text
+
+    def _read_gemini_stream(self, response) -> str:
+        """Joins the text parts of a streamGenerateContent SSE response."""
+        parts = []
+        last_event = None
+        with response:
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                last_event = line[5:].strip()
+                event = _parse_json(last_event)
+                for candidate in event.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        parts.append(part.get('text', ''))
+        if not parts:
+            return f"[ERROR] Bad Response: {(last_event or b'').decode('utf-8', errors='ignore')}"
+        return "".join(parts)
+
+    def _request_gemini(self, prompt: str, target_model: str, temperature: float = None,
+                        cached_content: str = None, prefix: str = None) -> str:
+        """
+        POSTs one streamGenerateContent request, retrying on 429/500/503.
+        prefix (the original files, when no context cache is available) is sent as its
+        own leading part rather than concatenated onto prompt, which would copy it.
+        """
+        # SSE stream: text arrives chunk by chunk instead of one multi-MB JSON body
+        url = f"{self.base_url}/{target_model}:streamGenerateContent?alt=sse&key={self.api_key}"
 
         # DEBUG LOG FOR USER VISIBILITY
         print(f"[*] Authenticating with Gemini API Key for model: {target_model}...")
 
-        headers = {'Content-Type': 'application/json'}
+        parts = [{"text": prefix}, {"text": "\n\n" + prompt}] if prefix else [{"text": prompt}]
         data = {
-            "contents": [{"parts": [{"text": prompt}]}]
+            "contents": [{"parts": parts}]
         }
+        if temperature is not None:
+            data["generationConfig"] = {"temperature": temperature}
+        if cached_content:
+            data["cachedContent"] = cached_content
+        body, headers = _gemini_body(data)
 
         # Retry logic for 429
         max_retries = 5
@@ -699,17 +1587,25 @@ This PR contains the **completely modernized** version of your legacy codebase.
 
         for attempt in range(max_retries):
             try:
-                response = requests.post(url, headers=headers, json=data)
+                response = self._gemini_http.post(url, headers=headers, data=body, timeout=GEMINI_TIMEOUT,
+                                                  stream=True)
                 
                 if response.status_code == 200:
-                    try:
-                        return response.json()['candidates'][0]['content']['parts'][0]['text']
-                    except (KeyError, IndexError):
-                        return f"[ERROR] Bad Response: {response.text}"
+                    return self._read_gemini_stream(response)
                 
                 elif response.status_code in [429, 500, 503]:
-                    wait = base_wait * (2 ** attempt)
-                    print(f"[*] API Error ({response.status_code}). Retrying in {wait}s...")
+                    if attempt == max_retries - 1:
+                        break
+                    # Honor the server's Retry-After; otherwise jittered exponential backoff
+                    try:
+                        wait = float(response.headers.get("Retry-After", 0))
+                    except ValueError:
+                        wait = 0
+                    if wait <= 0:
+                        wait = base_wait * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    wait = min(wait, GEMINI_MAX_RETRY_WAIT)
+                    response.close()  # streamed: hand the connection back to the pool
+                    print(f"[*] API Error ({response.status_code}). Retrying in {wait:.1f}s...")
                     time.sleep(wait)
                     continue
                 else:
@@ -721,8 +1617,7 @@ This PR contains the **completely modernized** version of your legacy codebase.
 
     def clean_code(self, text: str) -> str:
         """Extracts code from markdown blocks."""
-        pattern = r"```(?:javascript|python|bash)?\n(.*?)```"
-        match = re.search(pattern, text, re.DOTALL)
+        match = CODE_BLOCK_RE.search(text)
         if match:
             return match.group(1).strip()
         # If no markdown, assume raw text is code if it looks like it
@@ -744,15 +1639,12 @@ This PR contains the **completely modernized** version of your legacy codebase.
             files = deep_scan_result.get("files", [])
             file_count = len(files)
             
-            # Create file contents - NO LIMITS! Send FULL content to Gemini
-            files_content = ""
-            for f in files:  # ALL files - no limit!
-                files_content += f"\n\n=== FILE: {f['path']} ===\n```{f['language']}\n{f['content']}\n```"  # FULL content!
+            # FULL content of ALL files - no limit! Sent ahead of the prompt (context cache),
+            # the same block generate_code reuses
+            original_files, _ = self._original_files_context(deep_scan_result)
             
             preservation_context = f"""
-═══════════════════════════════════════════════════════════════════════════════
-EXISTING CODEBASE ANALYSIS (FROM DEEP SCAN)
-═══════════════════════════════════════════════════════════════════════════════
+## EXISTING CODEBASE ANALYSIS (FROM DEEP SCAN)
 
 DETECTED TECH STACK:
 - Backend Framework: {tech_stack.get('backend', {}).get('framework', 'Unknown')}
@@ -760,34 +1652,29 @@ DETECTED TECH STACK:
 - Frontend Framework: {tech_stack.get('frontend', {}).get('framework', 'Unknown')}
 
 🔒 MUST PRESERVE (DO NOT CHANGE):
-{chr(10).join(['- ' + item for item in must_preserve[:20]])}
+{bullet_list(must_preserve)}
 
 ✅ CAN MODERNIZE (UI/UX ONLY):
-{chr(10).join(['- ' + item for item in can_modernize[:20]])}
+{bullet_list(can_modernize)}
 
 DETECTED API ENDPOINTS (KEEP EXACTLY AS-IS):
-{chr(10).join(['- ' + ep for ep in api_endpoints[:20]])}
+{bullet_list(api_endpoints)}
 
-───────────────────────────────────────────────────────────────────────────────
-FULL FILE CONTENTS (USE THESE AS BASE):
-───────────────────────────────────────────────────────────────────────────────
-{files_content}
+## FULL FILE CONTENTS (USE THESE AS BASE):
+(The complete original files are provided at the start of this conversation, before these instructions.)
 """
         else:
             preservation_context = "[DEEP SCAN NOT AVAILABLE - Using path-only mode]"
             file_count = 0
+            original_files = None
         
         prompt = f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
-║  LAZARUS ENGINE - PRESERVATION-FIRST MODERNIZATION SYSTEM                   ║
-║  VERSION: 4.0 - PRESERVE & ENHANCE (NOT REPLACE!)                           ║
-╚══════════════════════════════════════════════════════════════════════════════╝
+## LAZARUS ENGINE - PRESERVATION-FIRST MODERNIZATION SYSTEM
+VERSION: 4.0 - PRESERVE & ENHANCE (NOT REPLACE!)
 
 ROLE: You are an elite architect who PRESERVES working systems while enhancing them.
 
-═══════════════════════════════════════════════════════════════════════════════
-🎯 THE GOLDEN RULE
-═══════════════════════════════════════════════════════════════════════════════
+## 🎯 THE GOLDEN RULE
 
 "IF IT WORKS, DON'T BREAK IT. IF IT'S UGLY, MAKE IT PRETTY. IF IT'S SLOW, MAKE IT FAST."
 
@@ -806,18 +1693,14 @@ YOU MUST NOT:
 ❌ Remove any existing functionality
 ❌ Create a "new architecture" - you are ENHANCING, not replacing!
 
-═══════════════════════════════════════════════════════════════════════════════
-📦 LEGACY REPOSITORY
-═══════════════════════════════════════════════════════════════════════════════
+## 📦 LEGACY REPOSITORY
 
 Repository URL: {repo_url}
 User Preferences: "{instructions if instructions else 'Modernize UI while preserving all functionality'}"
 
 {preservation_context}
 
-═══════════════════════════════════════════════════════════════════════════════
-📋 YOUR PLANNING TASK
-═══════════════════════════════════════════════════════════════════════════════
+## 📋 YOUR PLANNING TASK
 
 PHASE 1: PRESERVATION AUDIT
 Analyze the existing codebase and list:
@@ -895,7 +1778,8 @@ Your plan MUST include:
 Output format: Plain text architectural plan with clear sections.
 """
         # Use Gemini 3 Pro for complex reasoning
-        return self._call_gemini(prompt, model="gemini-3-pro-preview")
+        return self._call_gemini(prompt, model="gemini-3-pro-preview", cache_namespace=repo_url,
+                                 temperature=PLAN_TEMPERATURE, cached_prefix=original_files, cache_if=str.strip)
 
     def generate_code(self, plan: str, deep_scan_result: dict = None, repo_url: str = None) -> dict:
         """
@@ -916,22 +1800,19 @@ Output format: Plain text architectural plan with clear sections.
         # Get the comprehensive prompt from the prompts module
         # Pass deep_scan_result for preservation context (existing code, database, etc.)
         # Pass memory_context for cross-session learning
-        prompt = get_code_generation_prompt(plan, deep_scan_result, memory_context)
+        # The original files go in the shared context cache created by the planner
+        original_files, _ = self._original_files_context(deep_scan_result)
+        prompt = get_code_generation_prompt(plan, deep_scan_result, memory_context,
+                                            files_in_context=original_files is not None)
         
-        # Phase 2: Write Code -> Gemini 3 Pro (Needs Reasoning)
-        response = self._call_gemini(prompt, model="gemini-3-pro-preview")
+        # Phase 2: Write Code -> Gemini 3 Pro (Needs Reasoning). Not response-cached: the prompt
+        # carries the memory context (attempt counts) and retry errors, so it never repeats.
+        response = self._call_gemini(prompt, model="gemini-3-pro-preview",
+                                     cached_prefix=original_files)
         print("[DEBUG] Gemini 3 Pro Connected Successfully. Code Generated.")
         
         # XML Parsing Strategy
-        files = []
-        pattern = r'<file path="(.*?)">\s*(.*?)\s*</file>'
-        matches = re.findall(pattern, response, re.DOTALL)
-        
-        for filepath, content in matches:
-            files.append({
-                "filename": filepath.strip(), 
-                "content": content.strip()
-            })
+        files = parse_generated_files(response)
             
         if not files:
             # Fallback for debugging if regex fails
@@ -1016,70 +1897,44 @@ Output format: Plain text architectural plan with clear sections.
     def infer_dependencies(self, files: list) -> list:
         """
         Scans generated python code for imports using AST and returns specific PyPI packages.
+        Large file sets are parsed across a process pool (AST parsing is pure CPU).
         """
         detected = set()
-        
-        # 1. The "Rosetta Stone" of Imports
-        PACKAGE_MAP = {
-            # Data & AI
-            "numpy": "numpy",
-            "pandas": "pandas",
-            "cv2": "opencv-python-headless", # Headless for servers!
-            "PIL": "pillow",
-            "sklearn": "scikit-learn",
-            "openai": "openai",
-            "google.generativeai": "google-generative-ai",
-            
-            # Backend Frameworks
-            "fastapi": "fastapi",
-            "uvicorn": "uvicorn",
-            "flask": "flask",
-            "flask_cors": "flask-cors",
-            "sqlalchemy": "sqlalchemy",
-            
-            # Auth & Security
-            "jose": "python-jose[cryptography]",
-            "jwt": "python-jose[cryptography]",
-            "passlib": "passlib[bcrypt]",
-            "bcrypt": "bcrypt==4.0.1", # CRITICAL: Force 4.0.1
-            "multipart": "python-multipart", # Required for Form data
-            
-            # Utilities
-            "dotenv": "python-dotenv",
-            "requests": "requests",
-            "pydantic": "pydantic",
-            "email_validator": "email-validator",
-            "bs4": "beautifulsoup4"
-        }
 
-        # Scan all .py files
-        for f in files:
-            if f['filename'].endswith('.py'):
-                try:
-                    tree = ast.parse(f['content'])
-                    for node in ast.walk(tree):
-                        # Scan "import x"
-                        if isinstance(node, ast.Import):
-                            for alias in node.names:
-                                root = alias.name.split('.')[0]
-                                if root in PACKAGE_MAP:
-                                    detected.add(PACKAGE_MAP[root])
-                        
-                        # Scan "from x import y"
-                        elif isinstance(node, ast.ImportFrom):
-                            if node.module:
-                                root = node.module.split('.')[0]
-                                if root in PACKAGE_MAP:
-                                    detected.add(PACKAGE_MAP[root])
-                                
-                                # SPECIAL CASE: Pydantic Email
-                                if root == "pydantic":
-                                    for name in node.names:
-                                        if name.name == "EmailStr":
-                                            detected.add("pydantic[email]")
-                                            detected.add("email-validator")
-                except SyntaxError:
-                    print(f"[!] SyntaxError parsing {f['filename']}. Skipping AST scan.")
+        # Scan all .py files (unchanged files reuse their cached result across retries)
+        py_files = [f for f in files if f['filename'].endswith('.py')]
+        digests = [hashlib.sha256(f['content'].encode('utf-8')).hexdigest() for f in py_files]
+        misses = {d: f['content'] for d, f in zip(digests, py_files) if d not in self._infer_cache}
+        sources = list(misses.values())
+
+        if len(sources) < PARALLEL_INFER_MIN_FILES:
+            # Small stacks: process startup would cost more than it saves
+            results = [_infer_packages_from_source(src) for src in sources]
+        else:
+            try:
+                if self._infer_pool is None:
+                    # Created from a request thread while other threads (Sandbox warmup, HTTP
+                    # workers) run: spawn fresh workers rather than fork a multi-threaded process
+                    self._infer_pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                                           mp_context=multiprocessing.get_context("spawn"))
+                    atexit.register(self._infer_pool.shutdown, wait=False)
+                results = list(self._infer_pool.map(_infer_packages_from_source, sources, chunksize=8))
+            except Exception as pool_err:
+                print(f"[!] Parallel dependency scan unavailable ({pool_err}). Falling back to serial scan.")
+                if self._infer_pool is not None:
+                    # Release the broken pool's workers now; a later scan creates a new one
+                    atexit.unregister(self._infer_pool.shutdown)
+                    self._infer_pool.shutdown(wait=False, cancel_futures=True)
+                self._infer_pool = None
+                results = [_infer_packages_from_source(src) for src in sources]
+        self._infer_cache.update(zip(misses.keys(), results))
+
+        for f, digest in zip(py_files, digests):
+            packages = self._infer_cache[digest]
+            if packages is None:
+                print(f"[!] SyntaxError parsing {f['filename']}. Skipping AST scan.")
+                continue
+            detected.update(packages)
 
         # Always ensure basic runner tools are present
         detected.add("uvicorn")
@@ -1088,6 +1943,358 @@ Output format: Plain text architectural plan with clear sections.
             
         return list(detected)
 
+    def _detect_frontend(self, files: list) -> dict:
+        """
+        Detects JS frontends that need an npm build and static HTML/templates
+        served directly by the backend.
+        """
+        # ═══════════════════════════════════════════════════════════
+        # COMPREHENSIVE FRONTEND/PROJECT DETECTION
+        # Detects: React, Vue, Next.js, Vite, Angular, Static HTML,
+        #          PHP, Flask templates, Django templates, and more
+        # ═══════════════════════════════════════════════════════════
+        frontend_dirs = set()
+        frontend_type = "unknown"
+        has_static_html = False
+        static_html_dirs = set()
+        
+        for f in files:
+            path = f['filename']
+            basename = os.path.basename(path)
+            dirname = os.path.dirname(path)
+            
+            # ───────────────────────────────────────────────────────────
+            # JavaScript Framework Detection (Need npm build)
+            # ───────────────────────────────────────────────────────────
+            framework = FRAMEWORK_MARKERS.get(basename)
+            if framework is None:
+                match = FRAMEWORK_CONFIG_RE.search(basename.lower())
+                if match:
+                    framework = FRAMEWORK_CONFIG_TYPES[match.group(1)]
+                # Create React App
+                elif basename == 'package.json' and FRONTEND_DIR_RE.search(path.lower()):
+                    framework = "React/NPM"
+            if framework:
+                frontend_dirs.add(dirname)
+                frontend_type = framework
+            
+            # ───────────────────────────────────────────────────────────
+            # Static HTML + Template Detection (Served directly by backend)
+            # ───────────────────────────────────────────────────────────
+            if path.endswith(SERVED_PAGE_EXTS):
+                has_static_html = True
+                static_html_dirs.add(dirname)
+        
+        return {
+            "frontend_dirs": list(frontend_dirs),
+            "frontend_type": frontend_type,
+            "has_static_html": has_static_html,
+            "static_html_dirs": static_html_dirs,
+        }
+
+    def _upload_files(self, files: list):
+        """
+        Uploads all generated files to the sandbox as a single tar.gz bundle.
+        One write + one extract replaces a mkdir and a write RPC per file.
+        """
+        bundle = io.BytesIO()
+        sanitized = []
+        rewritten = 0
+        mtime = int(time.time())
+        with tarfile.open(fileobj=bundle, mode="w:gz", compresslevel=BUNDLE_COMPRESSLEVEL) as tar:
+            for file in files:
+                # Sanitize the filename to prevent bash shell issues
+                safe_filename = sanitize_path(file['filename'])
+                
+                # Log if path was modified (per-file detail only in verbose mode)
+                if safe_filename != file['filename']:
+                    rewritten += 1
+                    if self.verbose:
+                        print(f"  [!] Path sanitized: {file['filename']} -> {safe_filename}")
+                
+                data = file['content'].encode('utf-8')
+                info = tarfile.TarInfo(name=safe_filename)
+                info.size = len(data)
+                info.mtime = mtime
+                tar.addfile(info, io.BytesIO(data))
+                sanitized.append((safe_filename, file['content']))
+
+        if rewritten:
+            print(f"  [!] Sanitized {rewritten} file path(s) for bash compatibility.")
+
+        # Remember top-level entries so a reused Sandbox can be cleaned up
+        self._deployed_roots.update(
+            root for root in (name.split('/')[0] for name, _ in sanitized)
+            if root not in ("", ".", "..")
+        )
+
+        try:
+            self.sandbox.files.write(SANDBOX_BUNDLE_PATH, bundle.getvalue())
+            # tar creates intermediate directories itself, so no mkdir is needed
+            extract_result = self.sandbox.commands.run(f"tar -xzf {SANDBOX_BUNDLE_PATH} && rm -f {SANDBOX_BUNDLE_PATH}")
+            if extract_result.exit_code == 0:
+                print(f"[*] Uploaded {len(sanitized)} files in a single bundle.")
+                return
+            print(f"  [!] Bundle extract warning: {extract_result.stderr}")
+        except Exception as bundle_err:
+            print(f"  [!] Bundle upload failed: {bundle_err}")
+
+        # Fallback: write files individually, overlapping the network round-trips
+        print("[*] Falling back to per-file upload...")
+        dir_paths = {os.path.dirname(name) for name, _ in sanitized} - {".", ""}
+        if dir_paths:
+            try:
+                # We can't easily mkdir -p in sandbox file write, so we run one command for all dirs
+                quoted_dirs = " ".join(shlex.quote(d) for d in sorted(dir_paths))
+                mkdir_result = self.sandbox.commands.run(f"mkdir -p {quoted_dirs}")
+                if mkdir_result.exit_code != 0:
+                    print(f"  [!] mkdir warning: {mkdir_result.stderr}")
+            except Exception as mkdir_err:
+                print(f"  [!] mkdir failed: {mkdir_err}")
+                # Just continue, file write might still work
+
+        def _write_one(item):
+            safe_filename, content = item
+            try:
+                self.sandbox.files.write(safe_filename, content)
+                return safe_filename, None
+            except Exception as write_err:
+                return safe_filename, write_err
+
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as ex:
+            results = list(ex.map(_write_one, sanitized))
+
+        for safe_filename, write_err in results:
+            if write_err:
+                print(f"  [!] File write error for {safe_filename}: {write_err}")
+
+    def _sandbox_alive(self) -> bool:
+        """Cheap no-op ping to check the current Sandbox still accepts commands."""
+        try:
+            return self.sandbox.commands.run("true", timeout=5).exit_code == 0
+        except Exception:
+            return False
+
+    def _acquire_sandbox(self):
+        """
+        Reuses the current Sandbox if it is alive (skipping the cold start and
+        already-installed packages), otherwise replaces it with a new one.
+        """
+        if self._sandbox_state == "live" and self._sandbox_fresh:
+            # Just prepared by _warm_sandbox while Gemini was busy
+            self._sandbox_fresh = False
+            if time.monotonic() < self._sandbox_expires_at:
+                return
+
+        if self._sandbox_state == "live":
+            # Past its E2B timeout there's nothing to ping
+            if time.monotonic() < self._sandbox_expires_at and self._sandbox_alive():
+                print("[*] Reusing warm E2B Sandbox...")
+                self._reset_sandbox()
+                return
+            # Expired or unreachable: retire it before creating a new one
+            self._retire_sandbox()
+
+        # Create NEW Sandbox (Persistent) defined by self.sandbox
+        # Timeout set to 1800s (30m) to allow user to explore preview
+        print("[*] Creating new E2B Sandbox (30min timeout)...")
+        if E2B_TEMPLATE:
+            # Custom template with a prebuilt wheelhouse for the common packages
+            self.sandbox = Sandbox.create(template=E2B_TEMPLATE, timeout=SANDBOX_TIMEOUT)
+        else:
+            self.sandbox = Sandbox.create(timeout=SANDBOX_TIMEOUT)
+        self._background_processes = []
+        self._deployed_roots = set()
+        self._installed_reqs = set()
+        self._npm_installed = {}
+        self._sandbox_state = "live"
+        self._sandbox_expires_at = time.monotonic() + SANDBOX_TIMEOUT
+        print(f"[*] Sandbox created successfully. ID: {self.sandbox.id if hasattr(self.sandbox, 'id') else 'N/A'}")
+        # bash /dev/tcp probe (curl may not be installed, python is slow to start)
+        self._prepare_http_probe()
+
+    def _prewarm_gemini_connection(self):
+        """Opens the pooled Gemini TLS connection ahead of the first generateContent call."""
+        try:
+            self._gemini_http.head(self.base_url, timeout=5)
+        except Exception as e:
+            print(f"[*] Gemini connection prewarm skipped: {str(e)[:100]}")
+
+    def _warm_sandbox(self):
+        self._acquire_sandbox()
+        self._sandbox_fresh = True
+
+    def _start_sandbox_warmup(self):
+        """Starts acquiring the Sandbox in the background; execute_in_sandbox joins it."""
+        if not E2B_AVAILABLE or not E2B_API_KEY:
+            return
+        if self._sandbox_warmup is not None:
+            if not self._sandbox_warmup.done():
+                return
+            # Left over from an attempt that failed before deploying: settle it, then start afresh
+            self._join_sandbox_warmup()
+        self._sandbox_warmup = self._warmup_pool.submit(self._warm_sandbox)
+
+    def _join_sandbox_warmup(self):
+        if self._sandbox_warmup is None:
+            return
+        try:
+            self._sandbox_warmup.result()
+        except Exception as e:
+            print(f"[!] Sandbox warmup failed: {str(e)[:100]}")
+        finally:
+            self._sandbox_warmup = None
+
+    def _retire_sandbox(self):
+        """Kills the current Sandbox, if any. Also registered to run at interpreter exit."""
+        if self._sandbox_state != "live":
+            return
+        self._sandbox_state = "dying"
+        try:
+            print("[*] Terminating previous Sandbox...")
+            self.sandbox.kill()
+            print("[*] Previous Sandbox terminated successfully.")
+        except Exception as e:
+            print(f"[*] Sandbox cleanup warning: {str(e)[:100]}")
+        finally:
+            self.sandbox = None
+            self._sandbox_state = "none"
+            self._sandbox_fresh = False
+
+    def _reset_sandbox(self):
+        """Stops the previous deploy's servers and removes its files (node_modules are kept)."""
+        for process in self._background_processes:
+            try:
+                process.kill()
+            except Exception as e:
+                print(f"[*] Process cleanup warning: {str(e)[:100]}")
+        self._background_processes = []
+
+        if self._deployed_roots:
+            roots = " ".join(shlex.quote(r) for r in sorted(self._deployed_roots))
+            self.sandbox.commands.run(f"find {roots} -type f -not -path '*/node_modules/*' -delete 2>/dev/null; true")
+            self._deployed_roots = set()
+
+        try:
+            # Give the user a fresh 30 minutes with the new preview
+            self.sandbox.set_timeout(SANDBOX_TIMEOUT)
+            self._sandbox_expires_at = time.monotonic() + SANDBOX_TIMEOUT
+        except Exception as e:
+            print(f"[*] Sandbox timeout refresh warning: {str(e)[:100]}")
+
+    def _prepare_http_probe(self):
+        """
+        Picks the readiness probe for this Sandbox: bash /dev/tcp when available,
+        otherwise the urllib script (written once and re-run by path).
+        """
+        check = self.sandbox.commands.run("bash -c 'exec 3<>/dev/tcp/127.0.0.1/9' 2>&1 || true")
+        self._tcp_probe = "No such file" not in (check.stdout or "")
+        if not self._tcp_probe:
+            print("[*] bash /dev/tcp unavailable, using Python readiness probe.")
+            self.sandbox.files.write(PROBE_SCRIPT_PATH, PROBE_SCRIPT)
+
+    def _probe_http_status(self, port: int) -> str:
+        """Returns the HTTP status code served on `port` inside the Sandbox, or 'error'."""
+        if self._tcp_probe:
+            check = self.sandbox.commands.run(TCP_PROBE_CMD.format(port=port))
+            match = HTTP_STATUS_RE.match(check.stdout or "")
+            return match.group(1) if match else "error"
+        check = self.sandbox.commands.run(f"python {PROBE_SCRIPT_PATH} {port}")
+        return check.stdout.strip()
+
+    def _wait_for_port(self, port: int, timeout_s: float = 15, initial_delay: float = 0.2,
+                       label: str = None, early_log: str = None) -> bool:
+        """
+        Polls `port` inside the Sandbox with fast backoff until any HTTP response
+        (200, 404, etc.) comes back or `timeout_s` elapses. Returns True if it answered.
+        label: print each attempt under this name.
+        early_log: log file to peek at after EARLY_LOG_CHECK_AFTER seconds; stops waiting
+                   early when it shows a startup crash (SERVER_CRASH_RE).
+        """
+        start = time.monotonic()
+        early_log_checked = False
+        for i, delay in enumerate(backoff_delays(initial_delay)):
+            remaining = timeout_s - (time.monotonic() - start)
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            try:
+                status_code = self._probe_http_status(port)
+                if label:
+                    print(f"[*] {label} {i+1}: HTTP {status_code if status_code and status_code != 'error' else 'No Response'}")
+                
+                # Accept any valid HTTP response (200, 404, etc.) as success
+                if status_code and status_code.isdigit() and int(status_code) < 600:
+                    if label:
+                        print(f"[*] {label}: SUCCESS ✓ (HTTP {status_code})")
+                    return True
+            except Exception as e:
+                if label:
+                    print(f"[*] {label} {i+1}: Exception - {str(e)[:50]}")
+            
+            if early_log and not early_log_checked and time.monotonic() - start >= EARLY_LOG_CHECK_AFTER:
+                early_log_checked = True
+                try:
+                    log_preview = self._read_log_tail(early_log)
+                    if log_preview and len(log_preview) > 10:
+                        print(f"[DEBUG] Early Log Check (Server may have crashed):\n{log_preview[:300]}")
+                    if SERVER_CRASH_RE.search(log_preview):
+                        if label:
+                            print(f"[!] {label}: server crashed during startup, not waiting any longer.")
+                        return False
+                except:
+                    pass
+        return False
+
+    def _read_log_tail(self, path: str, max_bytes: int = LOG_TAIL_BYTES) -> str:
+        """
+        Returns the last `max_bytes` of a Sandbox log file ('' if missing).
+        files.read would transfer the whole file, which can be MBs for a crash loop.
+        """
+        result = self.sandbox.commands.run(f"tail -c {max_bytes} {shlex.quote(path)} 2>/dev/null || true")
+        return result.stdout or ""
+
+    def _start_npm_install(self, frontend_dir: str, by_name: dict):
+        """
+        Starts the frontend npm install in the background and returns its handle.
+        Returns None when this warm Sandbox already installed the same
+        package.json + package-lock.json into `frontend_dir` (node_modules are kept on reuse).
+        """
+        manifest = by_name.get(os.path.join(frontend_dir, "package.json"), {}).get('content', '')
+        lockfile = by_name.get(os.path.join(frontend_dir, "package-lock.json"), {}).get('content', '')
+        digest = hashlib.sha256(f"{manifest}\0{lockfile}".encode('utf-8')).hexdigest()
+        self._npm_pending[frontend_dir] = digest
+        
+        if self._npm_installed.get(frontend_dir) == digest:
+            print(f"[*] Frontend dependencies unchanged in {frontend_dir}, skipping npm install.")
+            return None
+        
+        # npm ci is faster when a lockfile exists; fall back if it is out of sync with package.json
+        print(f"[*] Installing Frontend dependencies in background (Timeout: 300s)...")
+        return self._run_background(
+            f"cd {frontend_dir} && (if [ -f package-lock.json ]; then npm ci || npm install --force; "
+            f"else npm install --force; fi) > {NPM_INSTALL_LOG} 2>&1",
+            timeout=300
+        )
+
+    def _finish_npm_install(self, frontend_dir: str, install):
+        """Waits for a background npm install and records its manifest hash on success."""
+        if install is None:
+            return
+        print("[*] Waiting for background Frontend dependency install...")
+        try:
+            install.wait()
+            self._npm_installed[frontend_dir] = self._npm_pending.get(frontend_dir)
+        except Exception as npm_err:
+            npm_log = self._read_log_tail(NPM_INSTALL_LOG, 2000)
+            print(f"[!] npm install warning: {str(npm_err)[:100]}\n{npm_log}")
+
+    def _run_background(self, cmd: str, **kwargs):
+        """Starts a long-running sandbox command and remembers it for cleanup on reuse."""
+        process = self.sandbox.commands.run(cmd, background=True, **kwargs)
+        self._background_processes.append(process)
+        return process
+
     def execute_in_sandbox(self, files: list, entrypoint: str, runtime: str = "python", deep_scan_result: dict = None):
         """
         Execute generated code in E2B sandbox.
@@ -1106,49 +2313,19 @@ Output format: Plain text architectural plan with clear sections.
         print(f"[*] Executing {entrypoint} in E2B Sandbox (Runtime: {runtime})...")
         
         try:
-            # AGGRESSIVE CLEANUP: Kill previous sandbox if exists
-            if self.sandbox:
-                try:
-                    print("[*] Terminating previous Sandbox...")
-                    self.sandbox.close()
-                    print("[*] Previous Sandbox terminated successfully.")
-                except Exception as e:
-                    print(f"[*] Sandbox cleanup warning: {str(e)[:100]}")
-                finally:
-                    self.sandbox = None
-
-            # Create NEW Sandbox (Persistent) defined by self.sandbox
-            # Timeout set to 1800s (30m) to allow user to explore preview
-            print("[*] Creating new E2B Sandbox (30min timeout)...")
-            self.sandbox = Sandbox.create(timeout=1800)
-            print(f"[*] Sandbox created successfully. ID: {self.sandbox.id if hasattr(self.sandbox, 'id') else 'N/A'}")
+            # Reuse the warm Sandbox when it is still alive, otherwise start fresh
+            self._join_sandbox_warmup()
+            self._acquire_sandbox()
             
             # Write ALL files (with path sanitization for bash compatibility)
-            for file in files:
-                # Sanitize the filename to prevent bash shell issues
-                safe_filename = sanitize_path(file['filename'])
-                
-                # Log if path was modified
-                if safe_filename != file['filename']:
-                    print(f"  [!] Path sanitized: {file['filename']} -> {safe_filename}")
-                
-                # Create directories if needed
-                dir_path = os.path.dirname(safe_filename)
-                if dir_path and dir_path not in [".", ""]:
-                    try:
-                        # We can't easily mkdir -p in sandbox file write, so we run a command
-                        mkdir_result = self.sandbox.commands.run(f"mkdir -p '{dir_path}'")
-                        if mkdir_result.exit_code != 0:
-                            print(f"  [!] mkdir warning for {dir_path}: {mkdir_result.stderr}")
-                    except Exception as mkdir_err:
-                        print(f"  [!] mkdir failed for {dir_path}: {mkdir_err}")
-                        # Try alternative - just continue, file write might still work
-                        pass
-                
-                try:
-                    self.sandbox.files.write(safe_filename, file['content'])
-                except Exception as write_err:
-                    print(f"  [!] File write error for {safe_filename}: {write_err}")
+            self._upload_files(files)
+            
+            # Filename and basename indexes for every lookup below (first occurrence wins)
+            by_name = {}
+            by_basename = {}
+            for f in files:
+                by_name.setdefault(f['filename'], f)
+                by_basename.setdefault(os.path.basename(f['filename']), f)
             
             # Install Dependencies Based on Runtime
             if runtime == "node" or entrypoint.endswith('.js'):
@@ -1157,11 +2334,26 @@ Output format: Plain text architectural plan with clear sections.
                 # ═══════════════════════════════════════════════════════════
                 print("[*] 🟢 Node.js Runtime Detected")
                 
+                # Frontend detection only needs the file list, so do it up front
+                detection = self._detect_frontend(files)
+                frontend_dirs = detection["frontend_dirs"]
+                frontend_type = detection["frontend_type"]
+                has_static_html = detection["has_static_html"]
+                static_html_dirs = detection["static_html_dirs"]
+                
                 # Find the directory containing package.json
                 entrypoint_dir = os.path.dirname(entrypoint)
                 if not entrypoint_dir:
                     entrypoint_dir = "."
                 
+                # Overlap the frontend npm install with the backend install, boot and health check.
+                # Skipped when the frontend shares the server's directory (same node_modules).
+                frontend_install = None
+                frontend_install_started = False
+                if frontend_dirs and (frontend_dirs[0] or ".") != entrypoint_dir:
+                    frontend_install = self._start_npm_install(frontend_dirs[0], by_name)
+                    frontend_install_started = True
+                
                 # CRITICAL: Look for package.json in ORIGINAL deep_scan first (uses 'path' key)
                 # Then fall back to generated files (uses 'filename' key)
                 original_package = None
@@ -1172,10 +2364,10 @@ Output format: Plain text architectural plan with clear sections.
                         print(f"[*] Found ORIGINAL package.json from repository scan: {original_package.get('path')}")
                 
                 # Also check generated files (fallback)
-                gen_package_json = next((f for f in files if f['filename'].endswith('package.json')), None)
+                gen_package_json = by_basename.get('package.json')
                 
                 # Check for package.json in entrypoint directory specifically
-                entrypoint_package = next((f for f in files if f['filename'] == f"{entrypoint_dir}/package.json"), None)
+                entrypoint_package = by_name.get(f"{entrypoint_dir}/package.json")
                 
                 # Use ORIGINAL package.json for dependencies, fall back to generated
                 package_source = original_package if original_package else gen_package_json
@@ -1195,8 +2387,7 @@ Output format: Plain text architectural plan with clear sections.
                         # Get the content of package.json
                         package_content = package_source.get('content', '')
                         if package_content:
-                            import json as json_module
-                            pkg_data = json_module.loads(package_content)
+                            pkg_data = _parse_json(package_content)
                             deps = list(pkg_data.get('dependencies', {}).keys())
                             dev_deps = list(pkg_data.get('devDependencies', {}).keys())
                             all_deps = deps + dev_deps
@@ -1204,7 +2395,8 @@ Output format: Plain text architectural plan with clear sections.
                             if all_deps:
                                 print(f"[*] 📦 Detected {len(all_deps)} dependencies: {', '.join(all_deps[:10])}{'...' if len(all_deps) > 10 else ''}")
                                 # Install ALL detected dependencies in entrypoint directory
-                                deps_str = ' '.join(all_deps)
+                                # Quote each name: package.json comes from the repo and may hold shell metacharacters
+                                deps_str = shlex.join(all_deps)
                                 print(f"[*] Installing dependencies in {entrypoint_dir}...")
                                 install_result = self.sandbox.commands.run(f"cd {entrypoint_dir} && npm init -y && npm install {deps_str}", timeout=300)
                             else:
@@ -1236,8 +2428,7 @@ Output format: Plain text architectural plan with clear sections.
                     # No package.json anywhere, install common packages in entrypoint directory
                     print("[*] No package.json found, installing common packages...")
                     package_dir = entrypoint_dir
-                    self.sandbox.commands.run(f"cd {entrypoint_dir} && npm init -y", timeout=30)
-                    self.sandbox.commands.run(f"cd {entrypoint_dir} && npm install express mongoose cors dotenv bcrypt multer node-fetch xlsx", timeout=180)
+                    self.sandbox.commands.run(f"cd {entrypoint_dir} && npm init -y && npm install express mongoose cors dotenv bcrypt multer node-fetch xlsx", timeout=210)
                 
                 # START NODE SERVER IN BACKGROUND
                 print(f"[*] Starting Node.js Server: {entrypoint} (logging to app.log)...")
@@ -1253,176 +2444,52 @@ Output format: Plain text architectural plan with clear sections.
                     print(f"[*] Node.js Command: node {entrypoint}")
                     node_cmd = f"node {entrypoint} > app.log 2>&1"
                 
-                self.sandbox.commands.run(node_cmd, background=True)
+                self._run_background(node_cmd)
                 
                 # HEALTH CHECK LOOP (for Node.js - check ports 3000 and 8000)
                 print("[*] Waiting for Node.js Backend to boot...")
                 backend_success = False
                 node_port = None
                 
-                for i in range(20):  # Try for 60 seconds
-                    time.sleep(3)
+                # Try for 60 seconds, polling fast at first since most servers boot in a second or two
+                start = time.monotonic()
+                early_log_checked = False
+                for i, delay in enumerate(backoff_delays(0.25, cap=3.0)):
+                    remaining = HEALTH_CHECK_TIMEOUT - (time.monotonic() - start)
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(delay, remaining))
                     try:
-                        # Check ALL common Node.js ports (3001 is very common!)
-                        for port in [3000, 3001, 8000, 8080, 5000, 4000, 5001]:
-                            check_script = f"""
-import urllib.request
-import urllib.error
-try:
-    response = urllib.request.urlopen('http://127.0.0.1:{port}', timeout=2)
-    print('PORT_{port}_OK')
-except urllib.error.HTTPError as e:
-    print('PORT_{port}_OK')  # 4xx/5xx still means server is running
-except:
-    pass
-"""
-                            result = self.sandbox.commands.run(f"python3 -c \"{check_script}\"")
-                            if f"PORT_{port}_OK" in result.stdout:
-                                node_port = port
-                                backend_success = True
-                                break
-                        
-                        if backend_success:
+                        # Check ALL common Node.js ports (3001 is very common!) in one command
+                        probe_cmd = NODE_PORT_PROBE_CMD if self._tcp_probe else NODE_PORT_PROBE_SCRIPT_CMD
+                        result = self.sandbox.commands.run(probe_cmd, timeout=30)
+                        open_port = (result.stdout or "").strip()
+                        if open_port.isdigit():
+                            node_port = int(open_port)
+                            backend_success = True
                             break
                             
-                        print(f"[*] Node.js Health Check {i+1}/20: Waiting...")
+                        print(f"[*] Node.js Health Check {i+1}: Waiting...")
                         
                         # Early log check for crash detection
-                        if i == 4:
-                            log_check = self.sandbox.commands.run(f"cd {package_dir} && cat app.log 2>/dev/null | head -10")
-                            if log_check.stdout:
-                                print(f"[DEBUG] Early Log Check:\n{log_check.stdout[:300]}")
+                        if not early_log_checked and time.monotonic() - start >= EARLY_LOG_CHECK_AFTER:
+                            early_log_checked = True
+                            early_log = self._read_log_tail(f"{package_dir}/app.log")
+                            if early_log:
+                                print(f"[DEBUG] Early Log Check:\n{early_log[:300]}")
                                 
                     except Exception as e:
-                        print(f"[*] Node.js Health Check {i+1}/20: {str(e)[:50]}...")
+                        print(f"[*] Node.js Health Check {i+1}: {str(e)[:50]}...")
                 
                 if not backend_success:
                     # Get logs for debugging
-                    log_result = self.sandbox.commands.run(f"cd {package_dir} && cat app.log 2>/dev/null")
-                    return f"FATAL: Node.js Backend failed to start after 60 seconds.\n\n=== APP.LOG ===\n{log_result.stdout[:1000]}\n==============="
+                    # Only the last 1000 bytes are reported, so only fetch those
+                    log_content = self._read_log_tail(f"{package_dir}/app.log", 1000)
+                    return f"FATAL: Node.js Backend failed to start after 60 seconds.\n\n=== APP.LOG ===\n{log_content}\n==============="
                 
                 backend_url = f"https://{self.sandbox.get_host(node_port)}"
                 print(f"[*] Node.js Backend Live at: {backend_url}")
                 
-                # ═══════════════════════════════════════════════════════════
-                # COMPREHENSIVE FRONTEND/PROJECT DETECTION
-                # Detects: React, Vue, Next.js, Vite, Angular, Static HTML,
-                #          PHP, Flask templates, Django templates, and more
-                # ═══════════════════════════════════════════════════════════
-                frontend_dirs = []
-                frontend_type = "unknown"
-                has_static_html = False
-                static_html_dirs = set()
-                
-                for f in files:
-                    path = f['filename']
-                    path_lower = path.lower()
-                    basename = os.path.basename(path)
-                    dirname = os.path.dirname(path)
-                    
-                    # ───────────────────────────────────────────────────────────
-                    # JavaScript Framework Detection (Need npm build)
-                    # ───────────────────────────────────────────────────────────
-                    
-                    # Next.js
-                    if 'next.config' in basename.lower():
-                        frontend_dirs.append(dirname)
-                        frontend_type = "Next.js"
-                    
-                    # Vite (React, Vue, Svelte)
-                    elif 'vite.config' in basename.lower():
-                        frontend_dirs.append(dirname)
-                        frontend_type = "Vite"
-                    
-                    # Angular
-                    elif basename == 'angular.json':
-                        frontend_dirs.append(dirname)
-                        frontend_type = "Angular"
-                    
-                    # Vue CLI
-                    elif basename == 'vue.config.js':
-                        frontend_dirs.append(dirname)
-                        frontend_type = "Vue CLI"
-                    
-                    # Create React App
-                    elif basename == 'package.json' and ('frontend' in path_lower or 'client' in path_lower or 'web' in path_lower):
-                        frontend_dirs.append(dirname)
-                        frontend_type = "React/NPM"
-                    
-                    # Nuxt.js
-                    elif 'nuxt.config' in basename.lower():
-                        frontend_dirs.append(dirname)
-                        frontend_type = "Nuxt.js"
-                    
-                    # Gatsby
-                    elif basename == 'gatsby-config.js':
-                        frontend_dirs.append(dirname)
-                        frontend_type = "Gatsby"
-                    
-                    # SvelteKit
-                    elif basename == 'svelte.config.js':
-                        frontend_dirs.append(dirname)
-                        frontend_type = "SvelteKit"
-                    
-                    # ───────────────────────────────────────────────────────────
-                    # Static HTML Detection (Served directly by backend)
-                    # ───────────────────────────────────────────────────────────
-                    if path.endswith('.html'):
-                        # Common static directories
-                        static_patterns = ['public', 'static', 'views', 'templates', 'www', 'html', 'pages']
-                        for pattern in static_patterns:
-                            if pattern in path_lower:
-                                static_html_dirs.add(dirname)
-                                has_static_html = True
-                                break
-                        
-                        # Any HTML at root or in recognized folder
-                        if dirname and not has_static_html:
-                            static_html_dirs.add(dirname)
-                            has_static_html = True
-                    
-                    # ───────────────────────────────────────────────────────────
-                    # Template Engine Detection (Served by backend)
-                    # ───────────────────────────────────────────────────────────
-                    
-                    # EJS (Express)
-                    if path.endswith('.ejs'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                    
-                    # Pug/Jade (Express)
-                    elif path.endswith('.pug') or path.endswith('.jade'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                    
-                    # Handlebars (Express)
-                    elif path.endswith('.hbs') or path.endswith('.handlebars'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                    
-                    # Jinja2 (Flask/Python)
-                    elif path.endswith('.jinja2') or path.endswith('.j2'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                    
-                    # Django templates
-                    elif '/templates/' in path and path.endswith('.html'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                    
-                    # PHP
-                    elif path.endswith('.php'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                    
-                    # Ruby ERB
-                    elif path.endswith('.erb'):
-                        has_static_html = True
-                        static_html_dirs.add(dirname)
-                
-                # Deduplicate JS framework dirs
-                frontend_dirs = list(set(frontend_dirs))
-                
                 # Log what was detected
                 if has_static_html:
                     static_dirs_str = ', '.join(list(static_html_dirs)[:3])
@@ -1434,20 +2501,21 @@ except:
                     print(f"[*] 🎨 JS Framework Detected: {frontend_type} at {frontend_dir}")
                     
                     # Install frontend dependencies
-                    print(f"[*] Installing Frontend dependencies (npm install)...")
-                    install_result = self.sandbox.commands.run(f"cd {frontend_dir} && npm install --force", timeout=300)
-                    if install_result.exit_code != 0:
-                        print(f"[!] npm install warning: {install_result.stderr[:200] if install_result.stderr else 'No stderr'}")
+                    if not frontend_install_started:
+                        frontend_install = self._start_npm_install(frontend_dir, by_name)
+                    self._finish_npm_install(frontend_dir, frontend_install)
                     
                     # Inject Backend URL into .env.local for Next.js
                     print(f"[*] Injecting Backend URL into frontend environment...")
                     env_content = f"NEXT_PUBLIC_API_URL={backend_url}\nVITE_API_URL={backend_url}\nREACT_APP_API_URL={backend_url}\n"
-                    self.sandbox.files.write(f"{frontend_dir}/.env.local", env_content)
-                    self.sandbox.files.write(f"{frontend_dir}/.env", env_content)
                     
-                    # Build frontend (for Next.js, React)
+                    # Build frontend (for Next.js, React); the env files are written by the same command
                     print(f"[*] Building Frontend for production...")
-                    build_result = self.sandbox.commands.run(f"cd {frontend_dir} && npm run build", timeout=300)
+                    build_result = self.sandbox.commands.run(
+                        f"cd {frontend_dir} && printf %s {shlex.quote(env_content)} > .env.local && cp .env.local .env "
+                        f"&& npm run build",
+                        timeout=300
+                    )
                     
                     if build_result.exit_code != 0:
                         error_output = (build_result.stderr or '') + (build_result.stdout or '')
@@ -1459,10 +2527,10 @@ except:
                     print(f"[*] Starting Frontend in production mode...")
                     # Try different start commands based on framework
                     start_cmd = f"cd {frontend_dir} && npm start -- -p 3000 > frontend.log 2>&1"
-                    self.sandbox.commands.run(start_cmd, background=True)
+                    self._run_background(start_cmd)
                     
-                    # Wait for frontend to boot
-                    time.sleep(10)
+                    # Wait for frontend to boot (returns as soon as port 3000 answers)
+                    self._wait_for_port(3000, timeout_s=FRONTEND_BOOT_TIMEOUT)
                     
                     # Get frontend URL
                     frontend_host = self.sandbox.get_host(3000)
@@ -1481,6 +2549,15 @@ except:
                 # PYTHON EXECUTION PATH (Original)
                 # ═══════════════════════════════════════════════════════════
                 print("[*] 🐍 Python Runtime Detected")
+                
+                # Check if we have a frontend package.json
+                frontend_dir = "modernized_stack/frontend"
+                has_frontend = f"{frontend_dir}/package.json" in by_name
+                npm_install = None
+                if has_frontend:
+                    # npm install is independent of the backend, so overlap it with pip + boot
+                    npm_install = self._start_npm_install(frontend_dir, by_name)
+                
                 print("[*] Installing Python dependencies (Timeout: 300s)...")
                 
                 # 1. Start with Intelligent Inference
@@ -1492,70 +2569,60 @@ except:
                     print(f"[DEBUG] Inferred: {', '.join(inferred)}")
 
                 # 2. Merge with requirements.txt if it exists
-                req_file = next((f for f in files if "requirements.txt" in f['filename']), None)
+                req_file = by_basename.get("requirements.txt")
                 if req_file:
                     print(f"[*] Merging with requirements.txt...")
-                    self.sandbox.commands.run(f"pip install -r {req_file['filename']}", timeout=300)
+                merged_reqs = merge_requirements(req_file['content'] if req_file else "", final_reqs)
                 
-                # 3. Force Install the Consolidated "Smart" list
-                if final_reqs:
-                    install_str = " ".join([f"'{p}'" for p in final_reqs])
-                    print(f"[*] Pre-loading inferred dependencies to prevent runtime errors...")
-                    self.sandbox.commands.run(f"pip install {install_str}", timeout=300)
+                # 3. Install the Consolidated "Smart" list in a single pip run
+                print(f"[*] Installing merged requirements in one pass...")
+                # A reused Sandbox only needs the packages it has not installed yet
+                pending_reqs = [r for r in merged_reqs if r not in self._installed_reqs]
+                pip_ok = True
+                if pending_reqs:
+                    if BCRYPT_PIN not in pending_reqs:
+                        pending_reqs.append(BCRYPT_PIN)
+                    self.sandbox.files.write(SANDBOX_REQUIREMENTS_PATH, "\n".join(pending_reqs) + "\n")
+                    pip_result = self.sandbox.commands.run(f"pip install --no-input --prefer-binary {WHEELHOUSE_ARGS} -r {SANDBOX_REQUIREMENTS_PATH}", timeout=300)
+                    pip_ok = pip_result.exit_code == 0
+                    if pip_ok:
+                        self._installed_reqs.update(pending_reqs)
+                    else:
+                        # One bad legacy line fails the whole merged pass; the inferred
+                        # packages (fastapi, uvicorn, ...) still need to go in on their own
+                        print("[!] Merged pip install failed. Installing inferred packages separately...")
+                        fallback_reqs = [r for r in sorted(final_reqs) if not r.lower().startswith("bcrypt")] + [BCRYPT_PIN]
+                        self.sandbox.files.write(SANDBOX_REQUIREMENTS_PATH, "\n".join(fallback_reqs) + "\n")
+                        fallback_result = self.sandbox.commands.run(f"pip install --no-input --prefer-binary {WHEELHOUSE_ARGS} -r {SANDBOX_REQUIREMENTS_PATH}", timeout=300)
+                        pip_ok = fallback_result.exit_code == 0
+                        if pip_ok:
+                            self._installed_reqs.update(fallback_reqs)
+                else:
+                    print("[*] All requirements already installed in warm Sandbox.")
                 
-                # 4. CRITICAL: Force bcrypt==4.0.1 to prevent version compatibility errors
-                print(f"[*] Enforcing bcrypt==4.0.1 (compatibility fix)...")
-                self.sandbox.commands.run("pip install --force-reinstall bcrypt==4.0.1", timeout=60)
+                # 4. CRITICAL: bcrypt==4.0.1 prevents version compatibility errors.
+                # A successful merged (or fallback) install already pinned it (now or on an
+                # earlier run), so only check the version, and reinstall on a mismatch, when pip failed.
+                if not pip_ok:
+                    bcrypt_check = self.sandbox.commands.run("python -c \"import bcrypt; print(bcrypt.__version__)\" 2>/dev/null || true")
+                    if (bcrypt_check.stdout or "").strip() != BCRYPT_PIN.split("==")[1]:
+                        print(f"[*] Enforcing {BCRYPT_PIN} (compatibility fix)...")
+                        self.sandbox.commands.run(f"pip install --force-reinstall {BCRYPT_PIN}", timeout=60)
 
                 # START SERVER IN BACKGROUND (With Logging)
                 print(f"[*] Starting Backend {entrypoint} in background (logging to app.log)...")
-                self.sandbox.commands.run(f"python {entrypoint} > app.log 2>&1", background=True)
+                self._run_background(f"python {entrypoint} > app.log 2>&1")
                 
                 # HEALTH CHECK LOOP (Backend)
                 print("[*] Waiting for Backend to boot...")
-                backend_success = False
-                for i in range(20): # Try for 60 seconds (increased from 45)
-                    time.sleep(3)
-                    try:
-                        # Use Python instead of curl (curl may not be installed)
-                        # Note: urlopen throws HTTPError for 4xx/5xx, so we catch it
-                        check_script = """
-import urllib.request
-import urllib.error
-try:
-    response = urllib.request.urlopen('http://127.0.0.1:8000', timeout=2)
-    print(response.status)
-except urllib.error.HTTPError as e:
-    print(e.code)
-except Exception as e:
-    print('error')
-"""
-                        check = self.sandbox.commands.run(f"python -c \"{check_script}\"")
-                        status_code = check.stdout.strip()
-                        print(f"[*] Backend Health Check {i+1}/20: HTTP {status_code if status_code and status_code != 'error' else 'No Response'}")
-                        
-                        # Accept any valid HTTP response (200, 404, etc.) as success
-                        if status_code and status_code.isdigit() and int(status_code) < 600: 
-                            print(f"[*] Backend Health Check: SUCCESS ✓ (HTTP {status_code})")
-                            backend_success = True
-                            break
-                    except Exception as e:
-                        print(f"[*] Backend Health Check {i+1}/20: Exception - {str(e)[:50]}")
-                        pass
-                    
-                    # Early log check after 5 attempts to diagnose issues faster
-                    if i == 4:
-                        try:
-                            early_log = self.sandbox.files.read("app.log")
-                            if early_log and len(early_log) > 10:
-                                print(f"[DEBUG] Early Log Check (Backend may have crashed):\n{early_log[:300]}")
-                        except:
-                            pass
+                backend_success = self._wait_for_port(
+                    8000, timeout_s=HEALTH_CHECK_TIMEOUT, label="Backend Health Check", early_log="app.log"
+                )
 
                 if not backend_success:
                     print("[!] Backend FAILED to start. Retrieving logs...")
                     try:
-                        log_content = self.sandbox.files.read("app.log")
+                        log_content = self._read_log_tail("app.log") or "Could not read app.log"
                         print(f"[DEBUG] App Log Preview:\n{log_content[:500]}")
                     except:
                         log_content = "Could not read app.log"
@@ -1567,26 +2634,24 @@ except Exception as e:
                 print(f"[*] Backend Live at: {backend_url}")
 
                 # --- PHASE 2: FRONTEND LAUNCH (Dual Stack) ---
-                # Check if we have a frontend package.json
-                has_frontend = any("frontend/package.json" in f['filename'] for f in files)
-                
                 if has_frontend:
                     print("🚀 Detected Frontend. Initiating Dual-Stack Launch...")
-                    frontend_dir = "modernized_stack/frontend"
                     
                     # CRITICAL: Create .env.local with backend URL BEFORE building
                     # Next.js bakes env vars at build time, not runtime
+                    # (written by the build command itself, saving a round-trip)
                     print(f"[*] Injecting Backend URL into .env.local...")
                     env_content = f"NEXT_PUBLIC_API_URL={backend_url}\n"
-                    self.sandbox.files.write(f"{frontend_dir}/.env.local", env_content)
-                    print(f"[DEBUG] Created .env.local with: NEXT_PUBLIC_API_URL={backend_url}")
                     
-                    print("[*] Installing Node dependencies (Timeout: 300s)...")
-                    self.sandbox.commands.run(f"cd {frontend_dir} && npm install --force", timeout=300)
+                    self._finish_npm_install(frontend_dir, npm_install)
                     
                     print(f"[*] Building Frontend for production (Backend URL: {backend_url})...")
                     # Now the build will include the backend URL
-                    build_result = self.sandbox.commands.run(f"cd {frontend_dir} && npm run build", timeout=300)
+                    build_result = self.sandbox.commands.run(
+                        f"cd {frontend_dir} && printf %s {shlex.quote(env_content)} > .env.local && npm run build",
+                        timeout=300
+                    )
+                    print(f"[DEBUG] Created .env.local with: NEXT_PUBLIC_API_URL={backend_url}")
                     
                     # Check for build errors
                     if build_result.exit_code != 0:
@@ -1599,10 +2664,10 @@ except Exception as e:
                     print(f"[*] Starting Frontend in production mode...")
                     # Start production server (API URL already baked into build)
                     start_cmd = f"cd {frontend_dir} && npm start -- -p 3000"
-                    self.sandbox.commands.run(f"{start_cmd} > frontend.log 2>&1", background=True)
+                    self._run_background(f"{start_cmd} > frontend.log 2>&1")
                     
-                    # Wait for Frontend
-                    time.sleep(10) # Give Next.js a moment to spin up
+                    # Wait for Frontend (returns as soon as Next.js answers on port 3000)
+                    self._wait_for_port(3000, timeout_s=FRONTEND_BOOT_TIMEOUT)
                     frontend_host = self.sandbox.get_host(3000)
                     frontend_url = f"https://{frontend_host}"
                     
@@ -1618,8 +2683,8 @@ except Exception as e:
             else: 
                     # Node entrypoint (Fallback)
                     cmd = f"node {entrypoint} > app.log 2>&1"
-                    self.sandbox.commands.run(cmd, background=True)
-                    time.sleep(5)
+                    self._run_background(cmd)
+                    self._wait_for_port(3000, timeout_s=5)
                     host = self.sandbox.get_host(3000)
                     return f"Node Server started.\n[PREVIEW_URL] https://{host}"
                 
@@ -1628,11 +2693,22 @@ except Exception as e:
 
     def process_resurrection_stream(self, repo_url: str, instructions: str):
         """Generator that yields logs and results in real-time."""
-        logs = []
+        try:
+            yield from self._resurrection_steps(repo_url, instructions)
+        finally:
+            # The run may end before execute_in_sandbox joins the warmup (every attempt raised,
+            # or the client went away): settle it here so the next run re-checks the Sandbox
+            self._join_sandbox_warmup()
+            self._sandbox_fresh = False
+
+    def _resurrection_steps(self, repo_url: str, instructions: str):
+        # Logs are streamed to the client as they happen; only their count is kept
+        log_count = 0
         deep_scan_result = None  # Store deep scan for reuse
         
         def emit_log(msg):
-            logs.append(msg)
+            nonlocal log_count
+            log_count += 1
             return {"type": "log", "content": msg}
 
         def emit_debug(msg):
@@ -1641,6 +2717,9 @@ except Exception as e:
         # Record resurrection attempt start in memory
         record_attempt_start(repo_url, None)
         
+        # Handshake with Gemini while the deep scan runs, off the planning call's critical path
+        self._warmup_pool.submit(self._prewarm_gemini_connection)
+        
         # 1. DEEP SCAN - Fetch ALL file contents for preservation
         yield emit_log("🔍 Initiating DEEP SCAN of Legacy Repository...")
         yield emit_log("📂 Fetching ALL file contents for preservation analysis...")
@@ -1652,8 +2731,8 @@ except Exception as e:
         must_preserve = deep_scan_result.get("must_preserve", [])
         files_analyzed = len(deep_scan_result.get("files", []))
         
-        # Update memory with tech stack
-        record_attempt_start(repo_url, tech_stack)
+        # Update memory with tech stack (the attempt itself was counted above)
+        record_tech_stack(repo_url, tech_stack)
         
         yield emit_debug(f"[DEBUG] Deep Scan Complete:\n  Files Analyzed: {files_analyzed}\n  Tech Stack: {tech_stack}\n  Must Preserve: {len(must_preserve)} items")
         
@@ -1664,6 +2743,10 @@ except Exception as e:
         if tech_stack.get("frontend", {}).get("framework"):
             yield emit_log(f"🎨 Detected Frontend: {tech_stack['frontend']['framework']}")
 
+        # Boot the sandbox while Gemini plans and writes code (the plan feeds the coder,
+        # so those two calls stay sequential)
+        self._start_sandbox_warmup()
+        
         # 2. PRESERVATION-FIRST PLANNING
         yield emit_log("📋 Creating PRESERVATION-FIRST Modernization Plan...")
         
@@ -1691,6 +2774,9 @@ except Exception as e:
                 if retry_count > 0:
                     yield emit_log(f"🔧 Auto-Healing: Regenerating code (Attempt {retry_count + 1}/{MAX_RETRIES + 1})...")
                     
+                    # Stop the failed deploy and clean the Sandbox while Gemini regenerates
+                    self._start_sandbox_warmup()
+                    
                     # Build comprehensive error context for AI
                     error_context = self._build_error_context(all_errors)
                     plan_with_error = plan + error_context
@@ -1765,7 +2851,10 @@ except Exception as e:
         # Extract HTML for preview
         preview = ""
         # Check logs for URL
-        url_match = re.search(r"\[PREVIEW_URL\] (https://[^\s]+)", sandbox_logs or "")
+        # The marker is written at the end of the sandbox output, so try the tail first
+        sandbox_logs = sandbox_logs or ""
+        url_match = (PREVIEW_URL_RE.search(sandbox_logs, max(0, len(sandbox_logs) - PREVIEW_TAIL_CHARS))
+                     or PREVIEW_URL_RE.search(sandbox_logs))
         if url_match:
             preview = url_match.group(1) # It's a URL now, not HTML content
         else:
@@ -1792,7 +2881,7 @@ except Exception as e:
         yield {
             "type": "result",
             "data": {
-                "logs": "\n".join(logs),
+                "log_count": log_count,
                 "artifacts": files,
                 "preview": preview,
                 "status": status,
@@ -1809,74 +2898,19 @@ except Exception as e:
         if not sandbox_logs:
             return False, "", ""
         
-        # Error patterns to detect with their types
-        error_patterns = [
-            # ═══════════════════════════════════════════════════════════
-            # NODE.JS SPECIFIC ERRORS (CRITICAL FOR AUTO-HEALING)
-            # ═══════════════════════════════════════════════════════════
-            (r"Cannot find module", "NODE_MODULE_NOT_FOUND"),
-            (r"Error: Cannot find module", "NODE_MODULE_NOT_FOUND"),
-            (r"MODULE_NOT_FOUND", "NODE_MODULE_NOT_FOUND"),
-            (r"node:internal/modules", "NODE_INTERNAL_ERROR"),
-            (r"throw err;", "NODE_CRASH"),
-            (r"ReferenceError:", "NODE_REFERENCE_ERROR"),
-            (r"Error: listen EADDRINUSE", "NODE_PORT_IN_USE"),
-            (r"ENOENT: no such file", "NODE_FILE_NOT_FOUND"),
-            (r"SyntaxError: Unexpected", "NODE_SYNTAX_ERROR"),
-            (r"Error: ENOENT", "NODE_FILE_NOT_FOUND"),
-            
-            # Server Failures
-            (r"FATAL: Node\.js Backend failed", "NODE_SERVER_CRASH"),
-            (r"FATAL: Backend failed", "BACKEND_CRASH"),
-            (r"Backend failed to start", "BACKEND_STARTUP_FAILED"),
-            (r"No such file or directory", "FILE_NOT_FOUND"),
-            (r"can't open file", "FILE_NOT_FOUND"),
-            
-            # Build Errors
-            (r"FRONTEND BUILD FAILED", "FRONTEND_BUILD_ERROR"),
-            (r"npm ERR!", "NPM_ERROR"),
-            (r"error TS\d+:", "TYPESCRIPT_ERROR"),
-            (r"SyntaxError:", "SYNTAX_ERROR"),
-            (r"Module not found", "MODULE_NOT_FOUND"),
-            
-            # Sandbox Errors
-            (r"Sandbox Error:", "SANDBOX_ERROR"),
-            (r"Command exited with code [^0]", "COMMAND_FAILED"),
-            (r"syntax error near unexpected token", "BASH_SYNTAX_ERROR"),
-            (r"mkdir.*failed", "MKDIR_ERROR"),
-            (r"Permission denied", "PERMISSION_ERROR"),
-            
-            # Python Errors  
-            (r"ModuleNotFoundError:", "PYTHON_IMPORT_ERROR"),
-            (r"ImportError:", "PYTHON_IMPORT_ERROR"),
-            (r"IndentationError:", "PYTHON_SYNTAX_ERROR"),
-            (r"NameError:", "PYTHON_NAME_ERROR"),
-            (r"TypeError:", "PYTHON_TYPE_ERROR"),
-            (r"FileNotFoundError:", "PYTHON_FILE_NOT_FOUND"),
-            
-            # Connection Errors
-            (r"ECONNREFUSED", "CONNECTION_ERROR"),
-            (r"Failed to connect", "CONNECTION_ERROR"),
-            (r"Backend connection failed", "BACKEND_ERROR"),
-            
-            # Generation Errors
-            (r"GENERATION FAILED", "GENERATION_ERROR"),
-            (r"No files were generated", "EMPTY_GENERATION"),
-            
-            # MongoDB/Database Errors
-            (r"MongoNetworkError", "DATABASE_CONNECTION_ERROR"),
-            (r"MongoServerError", "DATABASE_ERROR"),
-            (r"ECONNREFUSED.*27017", "MONGODB_CONNECTION_ERROR"),
-        ]
-        
-        for pattern, error_type in error_patterns:
-            match = re.search(pattern, sandbox_logs, re.IGNORECASE)
-            if match:
-                # Extract context around the error
-                start = max(0, match.start() - 200)
-                end = min(len(sandbox_logs), match.end() + 500)
-                error_context = sandbox_logs[start:end]
-                return True, error_type, error_context
+        # Single pass each: the earliest specific error, else the status line
+        patterns = ERROR_PATTERNS
+        match = ERROR_RE.search(sandbox_logs)
+        if not match:
+            patterns = STATUS_ERROR_PATTERNS
+            match = STATUS_ERROR_RE.search(sandbox_logs)
+        if match:
+            error_type = patterns[int(match.lastgroup[1:])][1]
+            # Extract context around the error
+            start = max(0, match.start() - 200)
+            end = min(len(sandbox_logs), match.end() + 500)
+            error_context = sandbox_logs[start:end]
+            return True, error_type, error_context
         
         return False, "", ""
     
@@ -1922,9 +2956,21 @@ FIX ALL ISSUES AND REGENERATE COMPLETE, WORKING CODE.
 # Singleton
 engine = LazarusEngine()
 
+# Resurrections share the engine's Sandbox and per-run state, so they run one at a time;
+# commits and PRs don't take this lock and are served meanwhile
+_resurrection_lock = threading.Lock()
+
 def process_resurrection(repo_url, instructions):
-    """Returns generator."""
-    return engine.process_resurrection_stream(repo_url, instructions)
+    """Returns generator. Waits (streaming a log line) while another resurrection runs."""
+    if not _resurrection_lock.acquire(blocking=False):
+        yield {"type": "log", "content": "⏳ Another resurrection is running, waiting for the Sandbox..."}
+        _resurrection_lock.acquire()
+    try:
+        # The attempt's memory updates stay in-process and are written once at the end
+        with memory_session(repo_url):
+            yield from engine.process_resurrection_stream(repo_url, instructions)
+    finally:
+        _resurrection_lock.release()
 
 def commit_code(repo_url, filename, content):
     return engine.commit_to_github(repo_url, filename, content)
@@ -1,24 +1,59 @@
 import json
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from lazarus_agent import process_resurrection, commit_code
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 PORT = 8000
+# Most connections served at once; further ones wait in the pool's queue
+REQUEST_WORKERS = 32
+# Idle keep-alive connections are dropped after this many seconds, freeing their pool worker
+KEEPALIVE_TIMEOUT = 15
+# Largest request body accepted (a full /api/create-pr payload of generated files fits easily)
+MAX_BODY_BYTES = 64 * 1024 * 1024
 
 class LazarusHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open, so the frontend's follow-up /api/commit
+    # reuses it. Every response must therefore carry Content-Length or be chunked.
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+    def read_json_body(self):
+        """
+        Reads and parses the JSON request body. orjson parses the bytes directly (no decoded
+        str copy), and the raw body is released as soon as this returns.
+        """
+        content_length = int(self.headers['Content-Length'])
+        if content_length > MAX_BODY_BYTES:
+            # The unread body is still on the socket, so this connection can't serve another request
+            self.close_connection = True
+            raise ValueError(f"Request body too large ({content_length} bytes)")
+        post_data = self.rfile.read(content_length)
+        if orjson is not None:
+            return orjson.loads(post_data)
+        return json.loads(post_data)
+
+    def write_chunk(self, data: bytes):
+        """Writes one chunk of a Transfer-Encoding: chunked body (empty data ends it)."""
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
     def do_POST(self):
         if self.path == '/api/resurrect':
             try:
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                request_json = json.loads(post_data)
+                request_json = self.read_json_body()
                 
                 repo_url = request_json.get('repo_url')
                 vibe_instructions = request_json.get('vibe_instructions')
@@ -29,26 +64,39 @@ class LazarusHandler(BaseHTTPRequestHandler):
                 self.send_header('Access-Control-Allow-Origin', '*')
                 # Disable buffering
                 self.send_header('Cache-Control', 'no-cache')
-                self.send_header('Connection', 'keep-alive')
+                # Length is unknown up front; chunked framing lets the connection stay open after
+                self.send_header('Transfer-Encoding', 'chunked')
                 self.end_headers()
 
-                # Call the generator
-                for chunk in process_resurrection(repo_url, vibe_instructions):
-                    # Write chunk as JSON line + newline
-                    line = json.dumps(chunk) + "\n"
-                    self.wfile.write(line.encode('utf-8'))
-                    self.wfile.flush()
+                # Call the generator. wfile is unbuffered, so each write blocks until the socket
+                # takes it: a slow client holds the generator back instead of queueing output.
+                stream = process_resurrection(repo_url, vibe_instructions)
+                try:
+                    for chunk in stream:
+                        # Write chunk as JSON line + newline (orjson serializes straight to bytes)
+                        if orjson is not None:
+                            line = orjson.dumps(chunk) + b"\n"
+                        else:
+                            line = (json.dumps(chunk) + "\n").encode('utf-8')
+                        self.write_chunk(line)
+                        self.wfile.flush()
+                finally:
+                    # If the client went away, stop the resurrection now and free the Sandbox lock
+                    stream.close()
+                
+                # Terminating chunk: the response is complete and the connection can be reused
+                self.write_chunk(b"")
+                self.wfile.flush()
                 
             except Exception as e:
                 # Can't send 500 if headers already sent, but we try
                 print(f"Error: {e}")
-                pass
+                # The body may be cut mid-chunk, so the connection can't be reused
+                self.close_connection = True
 
         elif self.path == '/api/commit':
             try:
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                request_json = json.loads(post_data)
+                request_json = self.read_json_body()
                 
                 repo_url = request_json.get('repo_url')
                 filename = request_json.get('filename')
@@ -57,11 +105,13 @@ class LazarusHandler(BaseHTTPRequestHandler):
                 # Call commit logic
                 result = commit_code(repo_url, filename, content)
                 
+                body = json.dumps(result).encode()
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps(result).encode())
+                self.wfile.write(body)
 
             except Exception as e:
                 self.send_error(500, str(e))
@@ -70,42 +120,64 @@ class LazarusHandler(BaseHTTPRequestHandler):
             try:
                 from lazarus_agent import commit_all_files
                 
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                request_json = json.loads(post_data)
+                request_json = self.read_json_body()
                 
                 repo_url = request_json.get('repo_url')
                 files = request_json.get('files')  # list of {"filename": str, "content": str}
                 
                 if not files or not repo_url:
+                    body = json.dumps({"status": "error", "message": "Missing repo_url or files"}).encode()
                     self.send_response(400)
                     self.send_header('Content-type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
                     self.send_header('Access-Control-Allow-Origin', '*')
                     self.end_headers()
-                    self.wfile.write(json.dumps({"status": "error", "message": "Missing repo_url or files"}).encode())
+                    self.wfile.write(body)
                     return
 
                 # Commit all files and create PR
                 result = commit_all_files(repo_url, files)
                 
+                body = json.dumps(result).encode()
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps(result).encode())
+                self.wfile.write(body)
 
             except Exception as e:
+                body = json.dumps({"status": "error", "message": str(e)}).encode()
                 self.send_response(500)
                 self.send_header('Content-type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps({"status": "error", "message": str(e)}).encode())
+                self.wfile.write(body)
         
         else:
             self.send_response(404)
+            self.send_header('Content-Length', '0')
             self.end_headers()
 
-def run(server_class=HTTPServer, handler_class=LazarusHandler, port=PORT):
+class PooledHTTPServer(ThreadingHTTPServer):
+    """
+    Serves each connection on a bounded thread pool instead of a new thread per request,
+    so a long /api/resurrect stream no longer blocks /api/commit.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix="lazarus-http")
+
+    def process_request(self, request, client_address):
+        # process_request_thread handles errors and closes the connection
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+def run(server_class=PooledHTTPServer, handler_class=LazarusHandler, port=PORT):
     server_address = ('', port)
     print(f"[*] Lazarus Backend running on port {port}...")
     httpd = server_class(server_address, handler_class)
@@ -1,6 +1,14 @@
 import os
+import json
+import hashlib
 import requests
 import base64
+import time
+from email.utils import parsedate_to_datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from simple_env import load_env
 
 load_env()
@@ -21,6 +29,113 @@ HEADERS = {
 
 BASE_API = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents"
 
+# One pooled session: every GET/PUT reuses the TLS connection to api.github.com
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+))
+
+# Below this many requests left in the hourly budget, wait for the window to reset
+RATE_LIMIT_FLOOR = 50
+
+class RateLimiter:
+    """Tracks GitHub's X-RateLimit-* headers and holds requests back when the budget runs low."""
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        # Sleeping under the lock holds every worker thread, which is the point
+        with self.lock:
+            if self.remaining is not None and self.remaining < RATE_LIMIT_FLOOR:
+                delay = self.reset_at - time.time()
+                if delay > 0:
+                    print(f"[*] {self.remaining} API calls left, waiting {delay:.0f}s for the rate limit reset...")
+                    time.sleep(delay)
+                self.remaining = None
+
+    def update(self, resp):
+        try:
+            remaining = int(resp.headers["X-RateLimit-Remaining"])
+            reset_at = int(resp.headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self.lock:
+            self.remaining, self.reset_at = remaining, reset_at
+
+RATE_LIMITER = RateLimiter()
+
+# Longest single wait on a rate-limit response before retrying
+RETRY_WAIT_CAP = 300
+
+def retry_delay(resp):
+    """
+    Seconds to wait before retrying a rate-limited response, or None if it isn't one.
+    Retry-After may be seconds or an HTTP-date; without it, GitHub's reset time is used.
+    """
+    if resp.status_code not in [403, 429]:
+        return None
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after:
+        if retry_after.strip().isdigit():
+            wait = int(retry_after)
+        else:
+            try:
+                wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                wait = 60
+    elif resp.status_code == 429 or resp.headers.get("X-RateLimit-Remaining") == "0" \
+            or "rate limit" in resp.text.lower():
+        # No Retry-After: wait for the window reset (at least a minute, per GitHub's guidance)
+        wait = max(RATE_LIMITER.reset_at - time.time(), 60)
+    else:
+        # A plain 403 (permissions): retrying won't help
+        return None
+    return min(max(wait, 1), RETRY_WAIT_CAP)
+
+def github_request(method, url, **kwargs):
+    """SESSION request that respects the rate-limit budget and retries once when rate limited."""
+    RATE_LIMITER.wait()
+    resp = SESSION.request(method, url, **kwargs)
+    RATE_LIMITER.update(resp)
+    wait = retry_delay(resp)
+    if wait is not None:
+        # Secondary rate limit: wait as told, then try once more
+        print(f"    [*] Rate limited, retrying in {wait:.0f}s...")
+        time.sleep(wait)
+        resp = SESSION.request(method, url, **kwargs)
+        RATE_LIMITER.update(resp)
+    return resp
+
+# Per-file ETag/SHA/content-hash from earlier runs, so unchanged files cost no API calls
+ETAG_CACHE_PATH = os.path.expanduser("~/.lazarus/etag.json")
+
+def load_etag_cache():
+    try:
+        with open(ETAG_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_etag_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(ETAG_CACHE_PATH), exist_ok=True)
+        with open(ETAG_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"[!] Could not save ETag cache: {e}")
+
+ETAGS = load_etag_cache()
+
+def cache_key(path):
+    return f"{REPO_OWNER}/{REPO_NAME}@{BRANCH}:{path}"
+
+def content_digest(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
 # Legacy Codebase Assets
 FILES = {
     "backend/api.py": """
@@ -117,16 +232,30 @@ $(document).ready(function() {
 """
 }
 
-def upload_file(path, content):
-    url = f"{BASE_API}/{path}"
-    
-    # Check if exists to get SHA
-    sha = None
-    resp = requests.get(url, headers=HEADERS)
+# FILES is static, so encode each payload and hash it once: path -> (content, base64, sha256)
+ENCODED = {
+    path: (content, base64.b64encode(content.encode('utf-8')).decode('utf-8'), content_digest(content))
+    for path, content in FILES.items()
+}
+
+def get_sha(path):
+    """SHA of the existing file at path (needed to update it), or None."""
+    cached = ETAGS.get(cache_key(path), {})
+    headers = {"If-None-Match": cached["etag"]} if cached.get("etag") else {}
+    resp = github_request("GET", f"{BASE_API}/{path}", headers=headers)
+    if resp.status_code == 304:
+        # Unchanged since we last saw it (and 304s don't count against the rate limit)
+        return cached.get("sha")
     if resp.status_code == 200:
         sha = resp.json()['sha']
+        ETAGS[cache_key(path)] = {"etag": resp.headers.get("ETag"), "sha": sha}
+        return sha
+    return None
+
+def upload_file(path, sha=None):
+    url = f"{BASE_API}/{path}"
 
-    encoded = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+    _, encoded, digest = ENCODED[path]
     data = {
         "message": f"Setup Legacy Architecture: {path}",
         "content": encoded,
@@ -136,14 +265,32 @@ def upload_file(path, content):
         data['sha'] = sha
 
     print(f"[*] Uploading {path}...")
-    put_resp = requests.put(url, headers=HEADERS, json=data)
+    put_resp = github_request("PUT", url, json=data)
     if put_resp.status_code in [200, 201]:
         print(f"    [+] Success")
+        ETAGS[cache_key(path)] = {
+            "etag": None,
+            "sha": put_resp.json()['content']['sha'],
+            "sha256": digest
+        }
     else:
         print(f"    [!] Failed: {put_resp.text}")
 
 print(f"[*] Populating {REPO_OWNER}/{REPO_NAME} with Legacy Code...")
-for path, content in FILES.items():
-    upload_file(path, content)
+# Files whose content matches what we last uploaded need neither the GET nor the PUT
+pending = []
+for path, (_, _, digest) in ENCODED.items():
+    if ETAGS.get(cache_key(path), {}).get("sha256") == digest:
+        print(f"[*] Unchanged since last upload, skipping {path}")
+    else:
+        pending.append(path)
+
+# SHA lookups are independent reads, so overlap them. Each PUT is a commit on BRANCH
+# and concurrent ones conflict (409), so those stay sequential.
+with ThreadPoolExecutor(max_workers=8) as ex:
+    shas = dict(zip(pending, ex.map(get_sha, pending)))
+for path in pending:
+    upload_file(path, shas[path])
+save_etag_cache(ETAGS)
 
 print("[*] Legacy Repo Population Complete.")
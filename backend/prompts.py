@@ -6,16 +6,57 @@ This module contains all prompts used by the Lazarus Engine.
 The core philosophy: COPY ALL ORIGINAL CODE, ONLY CHANGE STYLING.
 """
 
-def get_code_generation_prompt(plan: str, deep_scan_result: dict = None, memory_context: str = "") -> str:
+# Files with identical content are sent once; shorter ones cost less than the reference
+DEDUPE_MIN_CHARS = 256
+
+def get_original_files_context(deep_scan_result: dict) -> str:
     """
-    Returns the ABSOLUTE PRESERVATION code generation prompt.
-    Key principle: COPY every line of code, only enhance CSS/styling.
-    
-    Args:
-        plan: The modernization plan
-        deep_scan_result: Results from deep scanning the repository
-        memory_context: Past resurrection memory for this repository
+    Returns every scanned file, in full, as one block (a file identical to an earlier
+    one refers back to it instead of repeating the content).
+    This is the large, stable part of the planning and code generation prompts,
+    so the engine can send it once as a Gemini context cache.
+    """
+    files = deep_scan_result.get("files", [])
+    # One join at the end instead of re-copying the growing string per file
+    parts = []
+    # content -> (number, path) of the first file with it; later copies point back to it
+    first_seen = {}
+    for i, f in enumerate(files, 1):
+        content = f['content']
+        if len(content) >= DEDUPE_MIN_CHARS:
+            original = first_seen.setdefault(content, (i, f['path']))
+            if original[0] != i:
+                parts.append(f"""
+## ORIGINAL FILE #{i}: {f['path']}
+IDENTICAL TO ORIGINAL FILE #{original[0]} ({original[1]}).
+⚠️ YOU MUST STILL OUTPUT THIS FILE, IN FULL, AT ITS OWN PATH!
+""")
+                continue
+        parts.append(f"""
+## ORIGINAL FILE #{i}: {f['path']}
+COPY THIS FILE COMPLETELY, ONLY ENHANCE STYLING
+
+```{f['language']}
+{f['content']}
+```
+
+⚠️ YOU MUST OUTPUT THIS ENTIRE FILE WITH SAME FUNCTIONALITY!
+""")
+    return "".join(parts)
+
+# (deep_scan_result, files_in_context, (preservation rules, total files)) of the last build.
+# Auto-heal retries regenerate with the same scan and only a longer plan, so they reuse it.
+_last_preservation_rules = (None, None, ("", 0))
+
+def get_preservation_rules(deep_scan_result: dict, files_in_context: bool = False) -> tuple:
+    """
+    Returns (preservation rules block, total file count) for a scan result.
+    Built once per scan result; only the plan and memory context change between retries.
     """
+    global _last_preservation_rules
+    scan, in_context, cached = _last_preservation_rules
+    if scan is deep_scan_result and in_context == files_in_context and scan is not None:
+        return cached
     
     # Build list of ALL files that MUST be output
     file_list = ""
@@ -32,35 +73,22 @@ def get_code_generation_prompt(plan: str, deep_scan_result: dict = None, memory_
         total_endpoints = len(api_endpoints)
         
         # Build MANDATORY file list - ALL files must be output!
-        file_list = ""
-        for i, f in enumerate(files, 1):
-            file_list += f"  {i}. {f['path']}\n"
+        file_list = "".join(f"  {i}. {f['path']}\n" for i, f in enumerate(files, 1))
         
         # Build file contents - COMPLETE, NO TRUNCATION
-        for f in files:
-            existing_code_context += f"""
-████████████████████████████████████████████████████████████████████████████████
-█ ORIGINAL FILE #{files.index(f) + 1}: {f['path']}
-█ COPY THIS FILE COMPLETELY, ONLY ENHANCE STYLING
-████████████████████████████████████████████████████████████████████████████████
-
-```{f['language']}
-{f['content']}
-```
-
-⚠️ YOU MUST OUTPUT THIS ENTIRE FILE WITH SAME FUNCTIONALITY!
+        if files_in_context:
+            existing_code_context = """
+(The complete original files are provided at the start of this conversation, before these instructions.)
 """
+        else:
+            existing_code_context = get_original_files_context(deep_scan_result)
         
         # Build endpoint list
-        endpoint_list = ""
-        for i, ep in enumerate(api_endpoints, 1):
-            endpoint_list += f"  {i}. {ep}\n"
+        endpoint_list = "".join(f"  {i}. {ep}\n" for i, ep in enumerate(api_endpoints, 1))
         
         preservation_rules = f"""
 
-████████████████████████████████████████████████████████████████████████████████
-█ CRITICAL: ABSOLUTE PRESERVATION REQUIREMENTS
-████████████████████████████████████████████████████████████████████████████████
+## CRITICAL: ABSOLUTE PRESERVATION REQUIREMENTS
 
 📊 REPOSITORY STATISTICS:
    - Total Files: {total_files}
@@ -78,9 +106,7 @@ API ENDPOINTS YOU MUST PRESERVE (EVERY SINGLE ONE):
 DATABASE: {tech_stack.get('backend', {}).get('database', 'Unknown')}
 >> KEEP THE SAME DATABASE! COPY THE EXACT CONNECTION CODE! <<
 
-████████████████████████████████████████████████████████████████████████████████
-█ ALL ORIGINAL FILES (COPY EACH ONE COMPLETELY):
-████████████████████████████████████████████████████████████████████████████████
+## ALL ORIGINAL FILES (COPY EACH ONE COMPLETELY):
 {existing_code_context}
 """
     else:
@@ -89,16 +115,32 @@ DATABASE: {tech_stack.get('backend', {}).get('database', 'Unknown')}
 """
         total_files = 0
     
+    _last_preservation_rules = (deep_scan_result, files_in_context, (preservation_rules, total_files))
+    return preservation_rules, total_files
+
+def get_code_generation_prompt(plan: str, deep_scan_result: dict = None, memory_context: str = "",
+                               files_in_context: bool = False) -> str:
+    """
+    Returns the ABSOLUTE PRESERVATION code generation prompt.
+    Key principle: COPY every line of code, only enhance CSS/styling.
+    
+    Args:
+        plan: The modernization plan
+        deep_scan_result: Results from deep scanning the repository
+        memory_context: Past resurrection memory for this repository
+        files_in_context: The original files are sent separately (get_original_files_context)
+    """
+    
+    preservation_rules, total_files = get_preservation_rules(deep_scan_result, files_in_context)
+    
     return f"""
-████████████████████████████████████████████████████████████████████████████████
-█  LAZARUS ENGINE - ABSOLUTE PRESERVATION MODE                                █
-█  VERSION: 6.0 - COPY EVERYTHING, ENHANCE APPEARANCE ONLY                   █
-████████████████████████████████████████████████████████████████████████████████
+## LAZARUS ENGINE - ABSOLUTE PRESERVATION MODE
+VERSION: 6.0 - COPY EVERYTHING, ENHANCE APPEARANCE ONLY
 
 {memory_context if memory_context else ""}
 
 🚨 CRITICAL INSTRUCTION - READ CAREFULLY:
-═══════════════════════════════════════════════════════════════════════════════
+---
 
 YOU ARE NOT CREATING A NEW APPLICATION.
 YOU ARE ENHANCING AN EXISTING APPLICATION.
@@ -112,9 +154,7 @@ THIS MEANS:
 THE GOLDEN RULE:
 "COPY EVERYTHING. CHANGE ONLY HOW IT LOOKS, NOT WHAT IT DOES."
 
-═══════════════════════════════════════════════════════════════════════════════
-WHAT "ENHANCEMENT" MEANS (AND DOES NOT MEAN):
-═══════════════════════════════════════════════════════════════════════════════
+## WHAT "ENHANCEMENT" MEANS (AND DOES NOT MEAN):
 
 ✅ ENHANCEMENT (DO THIS):
 - Copy the entire original file
@@ -133,26 +173,20 @@ WHAT "ENHANCEMENT" MEANS (AND DOES NOT MEAN):
 - Changing the framework
 - Creating fewer files than the original
 
-═══════════════════════════════════════════════════════════════════════════════
-MANDATORY FILE COUNT CHECK:
-═══════════════════════════════════════════════════════════════════════════════
+## MANDATORY FILE COUNT CHECK:
 
 ORIGINAL REPOSITORY HAS: {total_files} FILES
 YOUR OUTPUT MUST HAVE: {total_files} FILES (OR MORE)
 
 IF YOUR OUTPUT HAS FEWER FILES, YOU HAVE FAILED.
 
-═══════════════════════════════════════════════════════════════════════════════
-SECTION 1: MODERNIZATION PLAN
-═══════════════════════════════════════════════════════════════════════════════
+## SECTION 1: MODERNIZATION PLAN
 
 {plan}
 
 {preservation_rules}
 
-═══════════════════════════════════════════════════════════════════════════════
-SECTION 2: OUTPUT FORMAT
-═══════════════════════════════════════════════════════════════════════════════
+## SECTION 2: OUTPUT FORMAT
 
 Output EVERY file in this exact XML format:
 
@@ -177,9 +211,7 @@ RULES:
 - EVERY function from original must be present
 - EVERY endpoint from original must be present
 
-═══════════════════════════════════════════════════════════════════════════════
-SECTION 3: SERVER FILE RULES (CRITICAL!)
-═══════════════════════════════════════════════════════════════════════════════
+## SECTION 3: SERVER FILE RULES (CRITICAL!)
 
 When enhancing server files (server.js, adminserver.js, etc.):
 
@@ -205,9 +237,7 @@ app.get('/admin', (req, res) => {{ /* COPY FROM ORIGINAL */ }});
 // ... ALL 20 endpoints from original!
 ```
 
-═══════════════════════════════════════════════════════════════════════════════
-SECTION 4: HTML FILE RULES
-═══════════════════════════════════════════════════════════════════════════════
+## SECTION 4: HTML FILE RULES
 
 When enhancing HTML files:
 
@@ -219,9 +249,7 @@ When enhancing HTML files:
 6. ENHANCE: Add responsive meta tags
 7. ENHANCE: Link to modern CSS file
 
-═══════════════════════════════════════════════════════════════════════════════
-SECTION 5: CSS ENHANCEMENT
-═══════════════════════════════════════════════════════════════════════════════
+## SECTION 5: CSS ENHANCEMENT
 
 CREATE OR ENHANCE a modern CSS file with:
 - CSS variables for theming
@@ -232,9 +260,7 @@ CREATE OR ENHANCE a modern CSS file with:
 - Modern fonts (Inter, Roboto, etc.)
 - Responsive breakpoints
 
-═══════════════════════════════════════════════════════════════════════════════
-SECTION 6: PERFORMANCE OPTIMIZATION (STRICT OUTPUT PRESERVATION)
-═══════════════════════════════════════════════════════════════════════════════
+## SECTION 6: PERFORMANCE OPTIMIZATION (STRICT OUTPUT PRESERVATION)
 
 You MAY optimize slow code for better performance, BUT:
 
@@ -292,9 +318,7 @@ function findDuplicates(arr) {{
 }}
 ```
 
-═══════════════════════════════════════════════════════════════════════════════
-FINAL VERIFICATION BEFORE OUTPUT:
-═══════════════════════════════════════════════════════════════════════════════
+## FINAL VERIFICATION BEFORE OUTPUT:
 
 Before generating output, verify:
 □ You are outputting ALL {total_files} files
@@ -305,9 +329,7 @@ Before generating output, verify:
 □ Only styling/appearance has been changed
 □ Optimizations preserve exact output behavior
 
-═══════════════════════════════════════════════════════════════════════════════
-NOW GENERATE ALL {total_files} ENHANCED FILES
-═══════════════════════════════════════════════════════════════════════════════
+## NOW GENERATE ALL {total_files} ENHANCED FILES
 
 Output every single file now.
 Copy all functionality.
@@ -9,34 +9,99 @@ Gemini uses this to make smarter choices on subsequent resurrections.
 
 import os
 import json
+import atexit
 import hashlib
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
+from functools import lru_cache
 from typing import Optional, Dict, List
 
+# orjson reads/writes the memory files as UTF-8 bytes directly; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Memory storage directory
 MEMORY_DIR = os.path.join(os.path.dirname(__file__), "resurrection_memory")
+os.makedirs(MEMORY_DIR, exist_ok=True)
+
+# Most recent entries kept per history field; in memory these are deques, so the
+# oldest entry drops off as a new one is appended
+HISTORY_LIMITS = {"failures": 10, "decisions": 20, "successful_patterns": 15, "resurrection_history": 10}
 
+# repo_id -> memory dict; each file is parsed once, then mutated in place
+_MEMORY_CACHE = {}
+# repo_id -> repo_url for cached memory with changes not yet written to disk
+_DIRTY = {}
+# repo_id -> rendered prompt context; dropped whenever that repo's memory is saved
+_CONTEXT_CACHE = {}
+
+@lru_cache(maxsize=2048)
 def get_repo_id(repo_url: str) -> str:
     """Generate a unique ID for a repository URL."""
     # Normalize the URL
     normalized = repo_url.lower().strip().rstrip('/')
-    # Create a hash for privacy and filesystem safety
-    return hashlib.md5(normalized.encode()).hexdigest()[:16]
+    # Create a hash for privacy and filesystem safety (64-bit BLAKE2b: 16 hex chars)
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
 
+def _legacy_memory_path(repo_url: str) -> str:
+    """Memory file name from before repo ids moved from truncated MD5 to BLAKE2b."""
+    normalized = repo_url.lower().strip().rstrip('/')
+    legacy_id = hashlib.md5(normalized.encode(), usedforsecurity=False).hexdigest()[:16]
+    return os.path.join(MEMORY_DIR, f"{legacy_id}_memory.json")
+
+@lru_cache(maxsize=2048)
 def get_memory_path(repo_url: str) -> str:
-    """Get the path to the memory file for a repository."""
-    os.makedirs(MEMORY_DIR, exist_ok=True)
+    """
+    Get the path to the memory file for a repository.
+    Pure path computation: MEMORY_DIR is created once, at import.
+    """
     return os.path.join(MEMORY_DIR, f"{get_repo_id(repo_url)}_memory.json")
 
 def load_memory(repo_url: str) -> Dict:
     """
     Load the resurrection memory for a repository.
     Returns empty memory if none exists.
+    The file is read once per process; later calls return the same (cached) dict.
     """
+    repo_id = get_repo_id(repo_url)
+    memory = _MEMORY_CACHE.get(repo_id)
+    if memory is None:
+        memory = _MEMORY_CACHE[repo_id] = _as_ring_buffers(_read_memory(repo_url))
+    return memory
+
+def _as_ring_buffers(memory: Dict) -> Dict:
+    """Turns the history lists into bounded deques (JSON stores them as lists)."""
+    for field, limit in HISTORY_LIMITS.items():
+        if not isinstance(memory.get(field), deque):
+            memory[field] = deque(memory.get(field, []), maxlen=limit)
+    return memory
+
+def _last(entries, n: int) -> list:
+    """The last n items of a history deque (deques can't be sliced)."""
+    return list(islice(entries, max(len(entries) - n, 0), None))
+
+def _read_memory(repo_url: str) -> Dict:
     path = get_memory_path(repo_url)
     
+    if not os.path.exists(path):
+        legacy_path = _legacy_memory_path(repo_url)
+        if os.path.exists(legacy_path):
+            # Adopt the file under the current id so past learnings carry over
+            try:
+                os.replace(legacy_path, path)
+            except OSError as e:
+                print(f"[!] Memory migration warning: {e}")
+                path = legacy_path
+    
     if os.path.exists(path):
         try:
+            if orjson is not None:
+                with open(path, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
@@ -89,16 +154,66 @@ def create_empty_memory(repo_url: str) -> Dict:
     }
 
 def save_memory(repo_url: str, memory: Dict) -> bool:
-    """Save the resurrection memory for a repository."""
+    """
+    Save the resurrection memory for a repository.
+    Only updates the cache; flush_memory (end of each resurrection, and at exit) writes it.
+    """
+    repo_id = get_repo_id(repo_url)
+    _MEMORY_CACHE[repo_id] = _as_ring_buffers(memory)
+    _DIRTY[repo_id] = repo_url
+    _CONTEXT_CACHE.pop(repo_id, None)
+    return True
+
+def flush_memory(repo_url: str = None) -> bool:
+    """Writes pending memory changes for repo_url (or every repository) to disk."""
+    ok = True
+    for repo_id in ([get_repo_id(repo_url)] if repo_url else list(_DIRTY)):
+        url = _DIRTY.pop(repo_id, None)
+        if url is not None:
+            ok = _write_memory(url, _MEMORY_CACHE[repo_id]) and ok
+    return ok
+
+atexit.register(flush_memory)
+
+@contextmanager
+def memory_session(repo_url: str):
+    """
+    Groups the record_* calls of one resurrection attempt: they only update the cached
+    memory, which is written to disk once when the block exits (however it exits).
+    Yields the memory dict.
+    """
+    try:
+        yield load_memory(repo_url)
+    finally:
+        flush_memory(repo_url)
+
+def _write_memory(repo_url: str, memory: Dict) -> bool:
     path = get_memory_path(repo_url)
+    # Written beside the target, then swapped in: an interrupted save leaves the old file intact
+    tmp = f"{path}.{os.getpid()}.tmp"
     
     try:
-        os.makedirs(MEMORY_DIR, exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(memory, f, indent=2, ensure_ascii=False)
+        # Compact: these files are only machine-read (python resurrection_memory.py --pretty <url> to inspect)
+        if orjson is not None:
+            data = orjson.dumps(memory, default=list)
+        else:
+            data = json.dumps(memory, separators=(",", ":"), default=list).encode('utf-8')
+        try:
+            f = open(tmp, 'wb')
+        except FileNotFoundError:
+            # MEMORY_DIR is created at import; only recreate it if it was removed since
+            os.makedirs(MEMORY_DIR, exist_ok=True)
+            f = open(tmp, 'wb')
+        with f:
+            f.write(data)
+        os.replace(tmp, path)
         return True
     except Exception as e:
         print(f"[!] Memory save error: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
         return False
 
 def record_attempt_start(repo_url: str, tech_stack: Dict = None) -> Dict:
@@ -110,16 +225,28 @@ def record_attempt_start(repo_url: str, tech_stack: Dict = None) -> Dict:
     
     memory["total_attempts"] += 1
     memory["last_resurrection"] = datetime.now().isoformat()
+    save_memory(repo_url, memory)
     
     # Update tech stack if provided
     if tech_stack:
-        memory["tech_stack"]["detected_backend"] = tech_stack.get("backend", {}).get("framework")
-        memory["tech_stack"]["detected_frontend"] = tech_stack.get("frontend", {}).get("framework")
-        memory["tech_stack"]["detected_database"] = tech_stack.get("backend", {}).get("database")
-    
-    save_memory(repo_url, memory)
+        record_tech_stack(repo_url, tech_stack)
     return memory
 
+def record_tech_stack(repo_url: str, tech_stack: Dict) -> None:
+    """
+    Remember the detected tech stack (known only after the deep scan, once the attempt
+    has started). Only marks the memory changed when the stack differs.
+    """
+    memory = load_memory(repo_url)
+    detected = {
+        "detected_backend": tech_stack.get("backend", {}).get("framework"),
+        "detected_frontend": tech_stack.get("frontend", {}).get("framework"),
+        "detected_database": tech_stack.get("backend", {}).get("database")
+    }
+    if any(memory["tech_stack"].get(key) != value for key, value in detected.items()):
+        memory["tech_stack"].update(detected)
+        save_memory(repo_url, memory)
+
 def record_failure(repo_url: str, error_type: str, error_message: str, context: str = "") -> None:
     """
     Record a failure for learning.
@@ -137,9 +264,8 @@ def record_failure(repo_url: str, error_type: str, error_message: str, context:
         "lesson_learned": generate_lesson(error_type, error_message)
     }
     
-    # Keep last 10 failures
+    # Keep last 10 failures (bounded deque)
     memory["failures"].append(failure)
-    memory["failures"] = memory["failures"][-10:]
     
     save_memory(repo_url, memory)
 
@@ -151,31 +277,28 @@ def record_success(repo_url: str, decisions: List[str] = None, patterns_used: Li
     memory = load_memory(repo_url)
     
     memory["successful_attempts"] += 1
+    # One timestamp for every entry this success records
+    now = datetime.now().isoformat()
     
     if decisions:
         for decision in decisions:
             memory["decisions"].append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now,
                 "decision": decision,
                 "outcome": "success"
-            })
-        # Keep last 20 decisions
-        memory["decisions"] = memory["decisions"][-20:]
+            })  # deque keeps the last 20
     
     if patterns_used:
         for pattern in patterns_used:
             if pattern not in memory["successful_patterns"]:
-                memory["successful_patterns"].append(pattern)
-        # Keep last 15 patterns
-        memory["successful_patterns"] = memory["successful_patterns"][-15:]
+                memory["successful_patterns"].append(pattern)  # deque keeps the last 15
     
     history_entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now,
         "outcome": "success",
         "decisions": decisions or []
     }
-    memory["resurrection_history"].append(history_entry)
-    memory["resurrection_history"] = memory["resurrection_history"][-10:]
+    memory["resurrection_history"].append(history_entry)  # deque keeps the last 10
     
     save_memory(repo_url, memory)
 
@@ -190,8 +313,7 @@ def record_dependency_issue(repo_url: str, package: str, issue: str) -> None:
     }
     
     # Avoid duplicates
-    existing = [d["package"] for d in memory["dependency_issues"]]
-    if package not in existing:
+    if not any(d["package"] == package for d in memory["dependency_issues"]):
         memory["dependency_issues"].append(issue_record)
     
     save_memory(repo_url, memory)
@@ -209,41 +331,53 @@ def record_decision(repo_url: str, decision: str, reasoning: str = "") -> None:
     
     save_memory(repo_url, memory)
 
+# Lesson per error type; the first key contained in the error type wins
+LESSONS = {
+    "NODE_MODULE_NOT_FOUND": "Ensure npm install runs in the correct directory where dependencies are expected.",
+    "FRONTEND_BUILD_ERROR": "Check for TypeScript errors and missing dependencies before building.",
+    "NODE_CRASH": "Verify all required modules are installed and paths are correct.",
+    "MONGODB_CONNECTION_ERROR": "MongoDB connection string may need updating or the database server may be unreachable.",
+    "SYNTAX_ERROR": "Code has syntax issues - review generated code for typos.",
+    "PORT_IN_USE": "The port is already in use - try a different port.",
+    "FILE_NOT_FOUND": "A required file is missing - check file paths.",
+    "PYTHON_IMPORT_ERROR": "Python module not installed - add to requirements.txt.",
+    "BACKEND_CRASH": "Server crashed on startup - check logs for details.",
+}
+DEFAULT_LESSON = "Review the error and adjust the approach accordingly."
+
 def generate_lesson(error_type: str, error_message: str) -> str:
     """Generate a lesson learned from an error."""
-    lessons = {
-        "NODE_MODULE_NOT_FOUND": "Ensure npm install runs in the correct directory where dependencies are expected.",
-        "FRONTEND_BUILD_ERROR": "Check for TypeScript errors and missing dependencies before building.",
-        "NODE_CRASH": "Verify all required modules are installed and paths are correct.",
-        "MONGODB_CONNECTION_ERROR": "MongoDB connection string may need updating or the database server may be unreachable.",
-        "SYNTAX_ERROR": "Code has syntax issues - review generated code for typos.",
-        "PORT_IN_USE": "The port is already in use - try a different port.",
-        "FILE_NOT_FOUND": "A required file is missing - check file paths.",
-        "PYTHON_IMPORT_ERROR": "Python module not installed - add to requirements.txt.",
-        "BACKEND_CRASH": "Server crashed on startup - check logs for details.",
-    }
-    
-    for error_key, lesson in lessons.items():
+    return _lesson_for(error_type)
+
+@lru_cache(maxsize=256)
+def _lesson_for(error_type: str) -> str:
+    # Error types come from a small fixed set, so each is scanned once
+    for error_key, lesson in LESSONS.items():
         if error_key in error_type:
             return lesson
     
-    return "Review the error and adjust the approach accordingly."
+    return DEFAULT_LESSON
 
 def get_memory_context_for_prompt(repo_url: str) -> str:
     """
     Generate a context string from memory for the AI prompt.
     This is the key function that injects past learnings into Gemini.
+    Rendered once per change to the memory (save_memory drops the cached copy).
     """
-    memory = load_memory(repo_url)
-    
+    repo_id = get_repo_id(repo_url)
+    cached = _CONTEXT_CACHE.get(repo_id)
+    if cached is None:
+        cached = _CONTEXT_CACHE[repo_id] = _render_memory_context(load_memory(repo_url))
+    return cached
+
+def _render_memory_context(memory: Dict) -> str:
     # If no past resurrections, return minimal context
     if memory["total_attempts"] == 0:
         return ""
     
-    context = f"""
-████████████████████████████████████████████████████████████████████████████████
-█ 🧠 RESURRECTION MEMORY (This repository has been resurrected before!)
-████████████████████████████████████████████████████████████████████████████████
+    # Fragments joined once at the end instead of re-copying a growing string
+    parts = [f"""
+## 🧠 RESURRECTION MEMORY (This repository has been resurrected before!)
 
 📊 PAST RESURRECTION STATISTICS:
    - Total Attempts: {memory["total_attempts"]}
@@ -251,64 +385,61 @@ def get_memory_context_for_prompt(repo_url: str) -> str:
    - Failed: {memory["failed_attempts"]}
    - Last Resurrection: {memory["last_resurrection"]}
 
-"""
+"""]
     
     # Add failure learnings (most important!)
     if memory["failures"]:
-        context += """
+        parts.append("""
 ⚠️ PAST FAILURES (AVOID THESE MISTAKES!):
-"""
-        for failure in memory["failures"][-5:]:  # Last 5 failures
-            context += f"""
+""")
+        parts.extend(f"""
    ❌ {failure["error_type"]}: {failure["error_message"][:100]}
       💡 Lesson: {failure["lesson_learned"]}
-"""
+""" for failure in _last(memory["failures"], 5))  # Last 5 failures
     
     # Add successful patterns
     if memory["successful_patterns"]:
-        context += """
+        parts.append("""
 ✅ SUCCESSFUL PATTERNS (USE THESE AGAIN):
-"""
-        for pattern in memory["successful_patterns"]:
-            context += f"   ✓ {pattern}\n"
+""")
+        parts.extend(f"   ✓ {pattern}\n" for pattern in memory["successful_patterns"])
     
     # Add dependency issues
     if memory["dependency_issues"]:
-        context += """
+        parts.append("""
 📦 DEPENDENCY PAIN POINTS (HANDLE CAREFULLY):
-"""
-        for issue in memory["dependency_issues"]:
-            context += f"   ⚠️ {issue['package']}: {issue['issue']}\n"
+""")
+        parts.extend(f"   ⚠️ {issue['package']}: {issue['issue']}\n" for issue in memory["dependency_issues"])
     
     # Add recent decisions
     if memory["decisions"]:
-        context += """
+        parts.append("""
 🎯 PAST DECISIONS:
-"""
-        for decision in memory["decisions"][-5:]:
+""")
+        for decision in _last(memory["decisions"], 5):
             outcome_emoji = "✓" if decision.get("outcome") == "success" else "○"
-            context += f"   {outcome_emoji} {decision['decision']}\n"
+            parts.append(f"   {outcome_emoji} {decision['decision']}\n")
     
     # Add tech stack memory
     if memory["tech_stack"]["detected_backend"]:
-        context += f"""
+        parts.append(f"""
 🔧 REMEMBERED TECH STACK:
    - Backend: {memory["tech_stack"]["detected_backend"]}
    - Frontend: {memory["tech_stack"]["detected_frontend"]}
    - Database: {memory["tech_stack"]["detected_database"]}
-"""
+""")
     
-    context += """
-████████████████████████████████████████████████████████████████████████████████
+    parts.append("""
+---
 
 USE THIS MEMORY TO MAKE BETTER DECISIONS!
 - Avoid patterns that failed before
 - Repeat patterns that succeeded
 - Handle known dependency issues proactively
 
-"""
+""")
     
-    return context
+    return "".join(parts)
 
 def get_memory_summary(repo_url: str) -> Dict:
     """Get a summary of the memory for API responses."""
@@ -326,6 +457,9 @@ def get_memory_summary(repo_url: str) -> Dict:
 def clear_memory(repo_url: str) -> bool:
     """Clear the memory for a repository (for testing/reset)."""
     path = get_memory_path(repo_url)
+    _MEMORY_CACHE.pop(get_repo_id(repo_url), None)
+    _DIRTY.pop(get_repo_id(repo_url), None)
+    _CONTEXT_CACHE.pop(get_repo_id(repo_url), None)
     
     if os.path.exists(path):
         try:
@@ -336,3 +470,11 @@ def clear_memory(repo_url: str) -> bool:
             return False
     
     return True
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1] == "--pretty":
+        # Debug aid: show a repository's memory indented for humans
+        print(json.dumps(load_memory(sys.argv[2]), indent=2, ensure_ascii=False, default=list))
+    else:
+        print("Usage: python resurrection_memory.py --pretty <repo_url>")
@@ -1,16 +1,45 @@
 import os
+import re
+
+# key -> value from .env as it took effect (a variable already set in the environment wins)
+_ENV_CACHE = {}
+# KEY=value on one line; blank lines, comments and lines without '=' never match
+_ENV_RE = re.compile(r'(?m)^[ \t]*([^#=\s][^=\n]*?)[ \t]*=[ \t]*(.*?)[ \t]*$')
+# .env is read once per process, however many modules call load_env()
+_LOADED = False
 
 def load_env():
     """Simple .env loader since python-dotenv is unavailable."""
-    try:
-        with open('.env', 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip()
-        print("[*] Environment variables loaded.")
-    except FileNotFoundError:
+    global _LOADED
+    if _LOADED:
+        return _ENV_CACHE
+    _LOADED = True
+    # Probe instead of catching FileNotFoundError: a missing .env is the normal case in containers
+    if not os.access('.env', os.R_OK):
         print("[!] .env file not found.")
+        return _ENV_CACHE
+    # One read of the whole (small) file; the regex does the per-line parsing in C
+    with open('.env', 'r') as f:
+        data = f.read()
+    for key, value in _ENV_RE.findall(data):
+        _ENV_CACHE[key] = os.environ.setdefault(key, value)
+    print("[*] Environment variables loaded.")
+    return _ENV_CACHE
+
+def get(key, default=None):
+    """Value of an environment variable, from the parsed .env when it set one."""
+    if key in _ENV_CACHE:
+        return _ENV_CACHE[key]
+    return os.environ.get(key, default)
+
+def __getattr__(name):
+    """
+    Module attributes for settings, e.g. `from simple_env import E2B_API_KEY`.
+    Resolved (loading .env first) on first reference, then cached as a module constant.
+    """
+    if not name.isupper():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    load_env()
+    value = get(name)
+    globals()[name] = value
+    return value
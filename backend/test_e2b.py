@@ -1,17 +1,25 @@
-from e2b_code_interpreter import Sandbox as CodeInterpreter
+import sys
 from simple_env import load_env
-import os
 
-load_env()
-E2B_API_KEY = os.getenv("E2B_API_KEY")
+def main():
+    load_env()
+    from simple_env import E2B_API_KEY
+    if not E2B_API_KEY:
+        print("[!] E2B_API_KEY not found.")
+        sys.exit(0)
 
-print(f"[*] Testing E2B Sandbox Connection with Key: {E2B_API_KEY[:5]}...")
+    print(f"[*] Testing E2B Sandbox Connection with Key: {E2B_API_KEY[:5]}...")
 
-try:
-    with CodeInterpreter() as sandbox:
-        print("[*] Sandbox created.")
-        execution = sandbox.notebook.exec_cell("print('Hello from the E2B Sandbox!')")
-        print(f"[*] Execution Result: {execution.text}")
-        
-except Exception as e:
-    print(f"[!] E2B Test Failed: {e}")
+    try:
+        # Imported only when the test actually runs: the SDK import is the slow part of startup
+        from e2b_code_interpreter import Sandbox as CodeInterpreter
+        with CodeInterpreter() as sandbox:
+            print("[*] Sandbox created.")
+            execution = sandbox.notebook.exec_cell("print('Hello from the E2B Sandbox!')")
+            print(f"[*] Execution Result: {execution.text}")
+            
+    except Exception as e:
+        print(f"[!] E2B Test Failed: {e}")
+
+if __name__ == "__main__":
+    main()
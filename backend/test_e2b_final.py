@@ -1,21 +1,27 @@
-from e2b_code_interpreter import Sandbox
+import sys
+import simple_env
 from simple_env import load_env
-import os
+from _e2b_sandbox import get_sandbox
 
-load_env()
-print("[*] Testing E2B Sandbox Connection (Final Check)...")
+def main():
+    load_env()
+    if not simple_env.get("E2B_API_KEY"):
+        print("[!] E2B_API_KEY not found.")
+        sys.exit(0)
+    print("[*] Testing E2B Sandbox Connection (Final Check)...")
 
-try:
-    with Sandbox.create() as sb:
+    try:
+        # Shared with the other test scripts in this process; the SDK is imported on first use
+        sb = get_sandbox()
         print("[*] Sandbox created.")
         
-        # Test Filesystem
-        sb.files.write("test.txt", "Hello World")
+        # Test Filesystem + Command in one round-trip: write the file, then read it back
+        cmd = sb.commands.run("printf 'Hello World' > test.txt && cat test.txt")
         print("[*] File written.")
-        
-        # Test Command
-        cmd = sb.commands.run("cat test.txt")
         print(f"[*] Command Output: {cmd.stdout}")
         
-except Exception as e:
-    print(f"[!] E2B Test Failed: {e}")
+    except Exception as e:
+        print(f"[!] E2B Test Failed: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,41 @@
-from e2b_code_interpreter import Sandbox
-from simple_env import load_env
 import os
+import sys
 import traceback
+import simple_env
+from simple_env import load_env
+from _e2b_sandbox import get_sandbox
 
-load_env()
+def write_text(path, text):
+    """One os.write on a raw fd: no buffered/text wrapper objects for a single short write."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, text.encode('utf-8'))
+    finally:
+        os.close(fd)
 
-print("[*] Testing Sandbox...")
-try:
-    with Sandbox.create() as sb:
-        with open("sb_attrs.txt", "w") as f:
-            f.write(str(dir(sb)))
+def main():
+    load_env()
+    # Opt-in: REUSE_ATTRS=1 keeps an existing attribute dump and skips the Sandbox boot
+    if os.getenv("REUSE_ATTRS") == "1" and os.path.exists("sb_attrs.txt"):
+        print("[*] Reusing existing sb_attrs.txt (unset REUSE_ATTRS to test Sandbox creation).")
+        sys.exit(0)
+    if not simple_env.get("E2B_API_KEY"):
+        print("[!] E2B_API_KEY not found.")
+        sys.exit(0)
+
+    print("[*] Testing Sandbox...")
+    try:
+        # Shared with the other test scripts in this process; the SDK is imported on first use
+        sb = get_sandbox()
+        write_text("sb_attrs.txt", "\n".join(dir(sb)))
         print("Success")
-except Exception:
-    with open("traceback.txt", "w") as f:
-        traceback.print_exc(file=f)
+    except Exception:
+        # Just the exception line by default; LAZARUS_FULL_TB=1 for the full stack with source lines
+        if os.getenv("LAZARUS_FULL_TB") == "1":
+            write_text("traceback.txt", traceback.format_exc())
+        else:
+            exc_type, exc_value, _ = sys.exc_info()
+            write_text("traceback.txt", "".join(traceback.format_exception_only(exc_type, exc_value)))
+
+if __name__ == "__main__":
+    main()
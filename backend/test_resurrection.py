@@ -2,14 +2,38 @@ from lazarus_agent import process_resurrection
 
 # Mock Data
 repo_url = "https://github.com/ArunN2005/demo-repo"
-vibe = "Fix the broken HTML and make it Cyberpunk"
+VIBES = [
+    "Fix the broken HTML and make it Cyberpunk",
+    "Minimalist",
+    "Retro",
+]
 
-print(f"Testing Lazarus with: {repo_url}")
-print("-" * 50)
+def run(vibe):
+    """Drains one resurrection stream, printing its logs; returns the final result payload."""
+    result = None
+    for chunk in process_resurrection(repo_url, vibe):
+        if chunk.get("type") == "result":
+            result = chunk["data"]
+        elif chunk.get("type") == "log":
+            print(chunk["content"])
+    return result
 
-# Run the agent
-result = process_resurrection(repo_url, vibe)
+def main():
+    # One at a time: resurrections share the engine's single Sandbox, so
+    # process_resurrection serializes them anyway
+    for vibe in VIBES:
+        print(f"Testing Lazarus with: {repo_url} ({vibe})")
+        print("-" * 50)
 
-print(result)
-print("-" * 50)
-print("Test Complete.")
+        # Run the agent
+        result = run(vibe)
+
+        if result:
+            print(f"Status: {result['status']}, files: {len(result['artifacts'])}, retries: {result['retry_count']}")
+        else:
+            print("No result returned.")
+        print("-" * 50)
+    print("Test Complete.")
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ type Artifact = {
 };
 
 type ApiResponse = {
-  logs: string;
+  log_count: number;
   artifact: Artifact;
   preview: string;
 };